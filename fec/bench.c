@@ -0,0 +1,377 @@
+/*
+ * Microbenchmark and regression harness for libbbfec
+ * Copyright (c) 2016 Daniel Estévez
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+ * OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+ * THE SOFTWARE.
+ */
+
+/*
+ * Usage: bbfec-bench [repetitions [warmup]]
+ *
+ * The outputs of the kernels are first checked against golden vectors, and
+ * the program fails if any of them differ. Then each kernel is timed and one
+ * tab separated line is written per kernel, with the time per call at several
+ * percentiles of the repetitions. Calls are timed in batches long enough for
+ * the clock resolution not to matter. On x86 the median is also given in TSC
+ * ticks.
+ */
+
+#define _POSIX_C_SOURCE 199309L
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <stdint.h>
+#include <string.h>
+#include <time.h>
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#define HAVE_TSC 1
+#endif
+
+#include "viterbi.h"
+#include "rs.h"
+#include "randomizer.h"
+
+#define BITS_PER_BYTE       8
+#define MAX_FEC_LENGTH      255
+#define DEFAULT_REPETITIONS 1000
+#define DEFAULT_WARMUP      100
+/* minimum duration of a timed batch of calls */
+#define MIN_BATCH_NS        10000
+/* bytes corrupted for the decode_rs timings with errors */
+#define RS_ERRORS           16
+
+/*
+ * Golden vectors: Viterbi encoded frames and the RS codewords they carry,
+ * before randomization. The short frame is TESTDATA in fec.py and the long
+ * frame carries the beacon in examples/aausat-4.wav.
+ */
+static const unsigned char short_symbols[128] = {
+    0x8c, 0x1a, 0x48, 0xc0, 0x04, 0x3f, 0xab, 0x4d, 0x3e, 0x79, 0x0e, 0x22,
+    0x74, 0xaf, 0x0a, 0x47, 0x9c, 0x01, 0x37, 0x70, 0xa2, 0xf8, 0x89, 0xdf,
+    0x13, 0xfe, 0xfd, 0x82, 0x54, 0x17, 0xb7, 0x94, 0x47, 0x0f, 0x24, 0x03,
+    0x99, 0xb8, 0x56, 0x2a, 0x83, 0x16, 0xf5, 0x76, 0x86, 0x1d, 0x7e, 0x72,
+    0xcf, 0x74, 0xbb, 0x29, 0xfc, 0xc0, 0xb6, 0xd6, 0xa5, 0xce, 0x36, 0x59,
+    0xe8, 0xee, 0x4d, 0x41, 0x2b, 0xf9, 0x5b, 0x70, 0x40, 0x45, 0x94, 0x00,
+    0xff, 0x35, 0x28, 0xf7, 0xf7, 0x92, 0xc5, 0xf7, 0x0c, 0x95, 0xea, 0xf2,
+    0x57, 0x47, 0x67, 0xea, 0xb6, 0x15, 0xe2, 0x6d, 0xf9, 0x77, 0xfc, 0x5e,
+    0xe8, 0x37, 0xed, 0xa2, 0xec, 0xa7, 0xc6, 0x01, 0xf4, 0xd5, 0x68, 0xc9,
+    0xec, 0xa9, 0xd6, 0xf8, 0xef, 0x01, 0x5f, 0x67, 0xb9, 0x8a, 0x79, 0xb2,
+    0xd8, 0x09, 0x2f, 0xd6, 0x0d, 0x2c, 0xee, 0x25,
+};
+
+static const unsigned char short_block[63] = {
+    0x00, 0x03, 0x00, 0x01, 0x4e, 0x90, 0x00, 0x3e, 0xd6, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xda, 0x7e, 0xbc, 0x37, 0x17,
+    0xa4, 0x22, 0xc6, 0x9c, 0xa6, 0xee, 0x78, 0x97, 0x1b, 0x6b, 0x5b, 0x11,
+    0x50, 0x3a, 0xda, 0x1d, 0x8b, 0x91, 0x5d, 0x55, 0xf6, 0x67, 0x05, 0xf2,
+    0x20, 0x74, 0xf0,
+};
+
+static const unsigned char long_symbols[250] = {
+    0x8c, 0x1a, 0x70, 0x83, 0x0f, 0x4f, 0x49, 0x1c, 0x59, 0xca, 0x72, 0xaa,
+    0x16, 0x68, 0x4d, 0x60, 0xd1, 0x9e, 0x3c, 0x00, 0xa2, 0xf8, 0xb1, 0x9f,
+    0xa7, 0x79, 0x72, 0xcf, 0xad, 0xc2, 0x51, 0x27, 0xf5, 0xbb, 0xe7, 0x2f,
+    0x73, 0xa2, 0xab, 0x6f, 0x76, 0x4b, 0xa6, 0x8a, 0xc5, 0xa4, 0xe4, 0x21,
+    0xea, 0x78, 0xc8, 0x96, 0xd1, 0x50, 0x3b, 0x66, 0xa5, 0xf5, 0xf1, 0x59,
+    0xe5, 0x79, 0x00, 0x09, 0x7c, 0x0b, 0x56, 0x7a, 0xe1, 0x5b, 0x15, 0x19,
+    0x88, 0x53, 0x22, 0xb7, 0xd3, 0x63, 0xfe, 0xfe, 0x30, 0x37, 0x52, 0xd2,
+    0xb2, 0x0f, 0xba, 0xbc, 0x4f, 0xfb, 0xf6, 0x09, 0x50, 0x5e, 0xde, 0x51,
+    0x1c, 0x3c, 0x90, 0x0e, 0x66, 0xe1, 0x58, 0xaa, 0x0c, 0x5b, 0xd5, 0xda,
+    0x18, 0x75, 0xf9, 0xcb, 0x3d, 0xd2, 0xec, 0xa7, 0xf3, 0x02, 0xdb, 0x5a,
+    0x97, 0x38, 0xd9, 0x67, 0xa3, 0xba, 0x6b, 0x1e, 0x01, 0xa4, 0x8c, 0xd4,
+    0x98, 0xfa, 0xb4, 0xeb, 0x91, 0x4c, 0x84, 0x20, 0x4a, 0xf3, 0xf9, 0x30,
+    0xe3, 0x87, 0x1b, 0x0a, 0x2f, 0x88, 0x9d, 0xf1, 0xe6, 0xa0, 0x27, 0xda,
+    0x67, 0xcb, 0x79, 0x44, 0x70, 0xf2, 0x40, 0x39, 0x9b, 0x85, 0x62, 0xa8,
+    0x31, 0x6f, 0x57, 0x68, 0x61, 0xd7, 0xe7, 0x2c, 0xf7, 0x4b, 0xb2, 0x9f,
+    0xcc, 0x0b, 0x6d, 0x6a, 0x67, 0x1c, 0xca, 0xec, 0xc1, 0x18, 0x43, 0x92,
+    0x4c, 0x38, 0x03, 0x78, 0x56, 0x11, 0x72, 0x4b, 0x14, 0x55, 0x74, 0xa1,
+    0xf8, 0x0e, 0x00, 0x3c, 0x9e, 0x25, 0x82, 0xe8, 0xe3, 0xd4, 0xfd, 0xae,
+    0x0f, 0x5b, 0x52, 0x05, 0x37, 0x18, 0x8d, 0x96, 0x95, 0xc8, 0x6d, 0x02,
+    0x45, 0xe6, 0x2a, 0xb6, 0xc1, 0x0f, 0xdf, 0x07, 0x07, 0x83, 0x34, 0x85,
+    0xe5, 0x74, 0xac, 0xbb, 0x74, 0xe8, 0xc2, 0xcf, 0x95, 0x55,
+};
+
+static const unsigned char long_block[124] = {
+    0x00, 0x56, 0x00, 0xb1, 0x92, 0x48, 0x27, 0x00, 0x03, 0x00, 0x00, 0x54,
+    0x14, 0x57, 0x1f, 0x01, 0x26, 0x6e, 0x0e, 0xdb, 0xc7, 0xfe, 0xf8, 0x7f,
+    0x10, 0x11, 0xa3, 0x00, 0x04, 0x00, 0x3e, 0x02, 0x38, 0xff, 0xa5, 0x18,
+    0x00, 0x11, 0x3b, 0x03, 0x43, 0xf7, 0x1a, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x57,
+    0x00, 0x00, 0x00, 0x00, 0xff, 0xff, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x45, 0xcf, 0xfd, 0x5a,
+    0xd3, 0x3d, 0xbe, 0x4b, 0x0d, 0x19, 0x11, 0x51, 0x71, 0xba, 0x07, 0x0e,
+    0xe2, 0x19, 0xbc, 0x14, 0xa9, 0x3f, 0x32, 0xa4, 0x12, 0x1e, 0xe7, 0xbd,
+    0x87, 0x9c, 0x8f, 0xa4,
+};
+
+struct vector {
+    const char *name;
+    const unsigned char *symbols;
+    int symbols_len;
+    const unsigned char *block;
+    int block_len;
+};
+
+static const struct vector vectors[] = {
+    {"short", short_symbols, sizeof(short_symbols), short_block, sizeof(short_block)},
+    {"long", long_symbols, sizeof(long_symbols), long_block, sizeof(long_block)},
+};
+
+#define NVECTORS (sizeof(vectors) / sizeof(vectors[0]))
+
+/* State shared by the kernels */
+struct bench {
+    const struct vector *v;
+    void *vp;
+    int nbits;
+    int pad;
+    char sequence[MAX_FEC_LENGTH];
+    unsigned char symbols[2 * MAX_FEC_LENGTH];
+    unsigned char block[MAX_FEC_LENGTH];
+    unsigned char corrupted[MAX_FEC_LENGTH];
+    unsigned char out[MAX_FEC_LENGTH];
+};
+
+typedef void (*kernel_t)(struct bench *b);
+
+static uint64_t now_ns(void)
+{
+    struct timespec ts;
+
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000 + ts.tv_nsec;
+}
+
+static uint64_t now_ticks(void)
+{
+#ifdef HAVE_TSC
+    return __rdtsc();
+#else
+    return 0;
+#endif
+}
+
+static int compare_double(const void *a, const void *b)
+{
+    double x = *(const double *)a, y = *(const double *)b;
+
+    return (x > y) - (x < y);
+}
+
+static double percentile(const double *sorted, int n, double p)
+{
+    return sorted[(int)(p * (n - 1) + 0.5)];
+}
+
+/* Place errors bytes in distinct positions of the block, spread over it */
+static void corrupt(unsigned char *data, int len, int errors)
+{
+    int i;
+
+    for (i = 0; i < errors; i++)
+        data[(i * 37) % len] ^= 0x5a;
+}
+
+static void bench_init(struct bench *b, const struct vector *v)
+{
+    b->v = v;
+    b->nbits = v->block_len * BITS_PER_BYTE;
+    b->pad = NN - v->block_len;
+    ccsds_generate_sequence(b->sequence, MAX_FEC_LENGTH);
+    memcpy(b->symbols, v->symbols, v->symbols_len);
+    memcpy(b->block, v->block, v->block_len);
+    memcpy(b->corrupted, v->block, v->block_len);
+}
+
+/* Kernels */
+
+static void k_create_viterbi(struct bench *b)
+{
+    (void)b;
+    delete_viterbi(create_viterbi(MAX_FEC_LENGTH * BITS_PER_BYTE));
+}
+
+static void k_update_viterbi(struct bench *b)
+{
+    init_viterbi(b->vp, 0);
+    update_viterbi(b->vp, b->symbols, b->nbits + VITERBI_CONSTRAINT - 1);
+}
+
+static void k_chainback_viterbi(struct bench *b)
+{
+    chainback_viterbi(b->vp, b->out, b->nbits, 0);
+}
+
+static void k_encode_viterbi(struct bench *b)
+{
+    encode_viterbi(b->out, b->block, b->nbits);
+}
+
+static void k_encode_rs(struct bench *b)
+{
+    encode_rs(b->block, b->out, b->pad);
+}
+
+static void k_decode_rs(struct bench *b)
+{
+    memcpy(b->out, b->corrupted, b->v->block_len);
+    decode_rs(b->out, NULL, 0, b->pad);
+}
+
+static void k_ccsds_xor_sequence(struct bench *b)
+{
+    ccsds_xor_sequence(b->block, b->sequence, b->v->block_len);
+}
+
+/* Golden vector checks, returning the number of failures */
+static int fail(const struct vector *v, const char *what)
+{
+    fprintf(stderr, "FAIL %s: %s\n", v->name, what);
+    return 1;
+}
+
+static int check(const struct vector *v)
+{
+    struct bench b;
+    unsigned char data[MAX_FEC_LENGTH];
+    unsigned char channel[2 * MAX_FEC_LENGTH];
+    int failures = 0, errors;
+
+    bench_init(&b, v);
+    if ((b.vp = create_viterbi(MAX_FEC_LENGTH * BITS_PER_BYTE)) == NULL)
+        return fail(v, "create_viterbi");
+
+    /* decoding: Viterbi, derandomization and RS */
+    k_update_viterbi(&b);
+    errors = chainback_viterbi(b.vp, data, b.nbits, 0);
+    ccsds_xor_sequence(data, b.sequence, v->block_len);
+    if (errors != 0 || memcmp(data, v->block, v->block_len))
+        failures += fail(v, "update_viterbi/chainback_viterbi");
+
+    corrupt(data, v->block_len, RS_ERRORS);
+    if (decode_rs(data, NULL, 0, b.pad) != RS_ERRORS || memcmp(data, v->block, v->block_len))
+        failures += fail(v, "decode_rs");
+
+    /* encoding: RS, randomization and Viterbi */
+    memcpy(data, v->block, v->block_len - NROOTS);
+    encode_rs(data, data + v->block_len - NROOTS, b.pad);
+    if (memcmp(data, v->block, v->block_len))
+        failures += fail(v, "encode_rs");
+
+    ccsds_xor_sequence(data, b.sequence, v->block_len);
+    encode_viterbi(channel, data, b.nbits);
+    if (memcmp(channel, v->symbols, v->symbols_len))
+        failures += fail(v, "ccsds_xor_sequence/encode_viterbi");
+
+    delete_viterbi(b.vp);
+    return failures;
+}
+
+/* Time kernel and print its line; units is the number of bits or bytes per call */
+static void run(const char *kernel, const char *name, kernel_t f, struct bench *b,
+                double units, const char *unit, int repetitions, int warmup)
+{
+    double *ns = malloc(repetitions * sizeof(double));
+    double *ticks = malloc(repetitions * sizeof(double));
+    uint64_t start, elapsed, t;
+    int batch, i, j;
+
+    for (i = 0; i < warmup; i++)
+        f(b);
+
+    /* batch size for MIN_BATCH_NS per timed batch */
+    for (batch = 1;; batch *= 2) {
+        start = now_ns();
+        for (j = 0; j < batch; j++)
+            f(b);
+        if (now_ns() - start >= MIN_BATCH_NS)
+            break;
+    }
+
+    for (i = 0; i < repetitions; i++) {
+        t = now_ticks();
+        start = now_ns();
+        for (j = 0; j < batch; j++)
+            f(b);
+        elapsed = now_ns() - start;
+        ticks[i] = (double)(now_ticks() - t) / batch;
+        ns[i] = (double)elapsed / batch;
+    }
+
+    qsort(ns, repetitions, sizeof(double), compare_double);
+    qsort(ticks, repetitions, sizeof(double), compare_double);
+    printf("%s\t%s\t%d\t%.0f\t%s\t%.1f\t%.1f\t%.1f\t%.1f\t%.1f\t%.0f\t%.3f\n",
+           kernel, name, batch, units, unit,
+           ns[0], percentile(ns, repetitions, 0.5), percentile(ns, repetitions, 0.9),
+           percentile(ns, repetitions, 0.99), ns[repetitions - 1],
+           percentile(ticks, repetitions, 0.5), percentile(ns, repetitions, 0.5) / units);
+
+    free(ns);
+    free(ticks);
+}
+
+int main(int argc, char **argv)
+{
+    int repetitions = argc > 1 ? atoi(argv[1]) : DEFAULT_REPETITIONS;
+    int warmup = argc > 2 ? atoi(argv[2]) : DEFAULT_WARMUP;
+    int failures = 0;
+    unsigned int i;
+    struct bench b;
+    char name[32];
+
+    if (repetitions < 1 || warmup < 0) {
+        fprintf(stderr, "Usage: %s [repetitions [warmup]]\n", argv[0]);
+        return 2;
+    }
+
+    for (i = 0; i < NVECTORS; i++)
+        failures += check(&vectors[i]);
+    if (failures)
+        return 1;
+
+    printf("# kernel\tvector\tbatch\tunits\tunit\tmin_ns\tp50_ns\tp90_ns\tp99_ns\tmax_ns\tp50_ticks\tp50_ns_per_unit\n");
+
+    bench_init(&b, &vectors[0]);
+    run("create_viterbi", "-", k_create_viterbi, &b, MAX_FEC_LENGTH * BITS_PER_BYTE, "bits",
+        repetitions, warmup);
+
+    for (i = 0; i < NVECTORS; i++) {
+        const struct vector *v = &vectors[i];
+
+        bench_init(&b, v);
+        b.vp = create_viterbi(MAX_FEC_LENGTH * BITS_PER_BYTE);
+        run("update_viterbi", v->name, k_update_viterbi, &b, b.nbits, "bits", repetitions, warmup);
+        run("chainback_viterbi", v->name, k_chainback_viterbi, &b, b.nbits, "bits", repetitions, warmup);
+        run("encode_viterbi", v->name, k_encode_viterbi, &b, b.nbits, "bits", repetitions, warmup);
+        run("encode_rs", v->name, k_encode_rs, &b, v->block_len, "bytes", repetitions, warmup);
+        run("decode_rs", v->name, k_decode_rs, &b, v->block_len, "bytes", repetitions, warmup);
+        corrupt(b.corrupted, v->block_len, RS_ERRORS);
+        snprintf(name, sizeof(name), "%s+%d", v->name, RS_ERRORS);
+        run("decode_rs", name, k_decode_rs, &b, v->block_len, "bytes", repetitions, warmup);
+        run("ccsds_xor_sequence", v->name, k_ccsds_xor_sequence, &b, v->block_len, "bytes",
+            repetitions, warmup);
+        delete_viterbi(b.vp);
+    }
+
+    return 0;
+}
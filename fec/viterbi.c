@@ -48,12 +48,32 @@ struct v27 {
     decision_t *dp;                     /* Pointer to current decision */
     metric_t *old_metrics,*new_metrics; /* Pointers to path metrics, swapped on every bit */
     decision_t *decisions;              /* Beginning of decisions for block */
+    metric_t *deltas;                   /* Survivor/competitor metric differences */
+    const unsigned char *known_mask;    /* Decoded bits with a known value */
+    const unsigned char *known_bits;    /* Known values of those bits */
+    unsigned int nknown;                /* Length of the known bits arrays, in bits */
+    int renorm;                         /* Total subtracted from the path metrics */
     uint16_t dlen;                      /* Length of decisions array for block */
 };
 
+/* Path metrics are renormalized before they can overflow */
+#define RENORM_THRESHOLD 128
+
+/* Path metric penalty for states contradicting a known bit */
+#define KNOWN_BIT_PENALTY 12
+
+/* Steps to follow a competitor path back when computing reliabilities */
+#define SOVA_WINDOW 48
+
+/* A deviation from a listed path onto the competitor branch */
+struct deviation {
+    int metric;                         /* Path metric of the deviating path */
+    uint16_t step;                      /* Trellis step where the paths merge */
+    uint8_t state;                      /* State where the paths merge */
+    uint8_t parent;                     /* Index of the listed path */
+};
+
 static branchtab_t branchtab[2];
-static struct v27 v27_local;
-static decision_t decisions_local;
 
 /* Create 256-entry odd-parity lookup table */
 static void partab_init(void)
@@ -111,10 +131,89 @@ int init_viterbi(void *p, int starting_state)
     vp->new_metrics = &vp->metrics2;
     vp->dp = vp->decisions;
     vp->old_metrics->w[starting_state & 63] = 0; /* Bias known start state */
+    vp->known_mask = NULL;
+    vp->renorm = 0;
     
     return 0;
 }
 
+/*
+ * Initialize Viterbi decoder for a frame that may start in either of two
+ * states, such as a frame received with either polarity
+ */
+int init_viterbi_dual(void *p, int state_a, int state_b)
+{
+    struct v27 *vp = p;
+
+    if (init_viterbi(p, state_a) == -1)
+        return -1;
+
+    vp->old_metrics->w[state_b & 63] = 0;
+
+    return 0;
+}
+
+/* Path metric of the given end state after an update */
+int metric_viterbi(void *p, unsigned int endstate)
+{
+    struct v27 *vp = p;
+
+    if (p == NULL)
+        return -1;
+
+    return vp->old_metrics->w[endstate % 64] + vp->renorm;
+}
+
+/*
+ * Bias the following updates towards paths whose decoded bits match the
+ * bits set in mask. The arrays are not copied, so they must stay valid
+ * until the decoder is initialized again.
+ */
+int constrain_viterbi(void *p, const unsigned char *mask, const unsigned char *bits, unsigned int nbits)
+{
+    struct v27 *vp = p;
+
+    if (p == NULL)
+        return -1;
+
+    vp->known_mask = mask;
+    vp->known_bits = bits;
+    vp->nknown = nbits;
+
+    return 0;
+}
+
+/* Subtract the smallest path metric from all of them */
+static void renormalize(struct v27 *vp)
+{
+    int i;
+    uint8_t min = UINT8_MAX;
+
+    for (i = 0; i < 64; i++)
+        if (vp->new_metrics->w[i] < min)
+            min = vp->new_metrics->w[i];
+
+    for (i = 0; i < 64; i++)
+        vp->new_metrics->w[i] -= min;
+
+    vp->renorm += min;
+}
+
+/* Penalize the states whose last input bit contradicts a known bit */
+static void apply_constraints(struct v27 *vp, unsigned int step)
+{
+    unsigned int state, bit, metric;
+
+    if (step >= vp->nknown || !(vp->known_mask[step >> 3] & (0x80 >> (step & 7))))
+        return;
+
+    bit = (vp->known_bits[step >> 3] >> (7 - (step & 7))) & 1;
+    for (state = bit ^ 1; state < 64; state += 2) {
+        metric = vp->new_metrics->w[state] + KNOWN_BIT_PENALTY;
+        vp->new_metrics->w[state] = metric > UINT8_MAX ? UINT8_MAX : metric;
+    }
+}
+
 void set_viterbi_polynomial(int16_t polys[2])
 {
     int state;
@@ -130,15 +229,21 @@ void set_viterbi_polynomial(int16_t polys[2])
 /* Create a new instance of a Viterbi decoder */
 void *create_viterbi(int16_t len)
 {
-    /* Keep state in internal RAM */
-    struct v27 *vp = &v27_local;
+    struct v27 *vp;
 
     if (!init)
         set_viterbi_polynomial(polys);
 
+    if ((vp = calloc(1, sizeof(struct v27))) == NULL)
+        return NULL;
+
     vp->dlen = (len + 6) * sizeof(decision_t);
-    if ((vp->decisions = malloc(vp->dlen)) == NULL)
+    vp->decisions = malloc(vp->dlen);
+    vp->deltas = malloc((len + 6) * sizeof(metric_t));
+    if (vp->decisions == NULL || vp->deltas == NULL) {
+        delete_viterbi(vp);
         return NULL;
+    }
 
     init_viterbi(vp, 0);
 
@@ -151,7 +256,7 @@ int chainback_viterbi(void *p, unsigned char *data, unsigned int nbits, unsigned
     int k;
     struct v27 *vp = p;
     decision_t *d;
-    int errors = vp->old_metrics->w[endstate];
+    int errors = vp->old_metrics->w[endstate % 64] + vp->renorm;
 
     if (unlikely(p == NULL))
         return -1;
@@ -181,8 +286,12 @@ void delete_viterbi(void *p)
 {
     struct v27 *vp = p;
 
-    if (vp->decisions != NULL)
-        free((void*)vp->decisions);
+    if (vp == NULL)
+        return;
+
+    free(vp->decisions);
+    free(vp->deltas);
+    free(vp);
 }
 
 /* C-language butterfly */
@@ -203,6 +312,35 @@ void delete_viterbi(void *p)
         d->w[b >> 2] |= decision << (((b << 1) + 1) & 7);                   \
     } while (0)
 
+/* C-language butterfly, also recording the metric difference between
+ * the survivor and the discarded competitor of each state */
+#define BFLY_SOFT(b)                                                        \
+    do {                                                                    \
+        metric = (branchtab[0].c[b] ^ sym0) + (branchtab[1].c[b] ^ sym1);   \
+                                                                            \
+        m0 = vp->old_metrics->w[b] + metric;                                \
+        m1 = vp->old_metrics->w[b + 32] + (2 - metric);                     \
+        decision = m0 > m1;                                                 \
+        vp->new_metrics->w[(b << 1)] = decision ? m1 : m0;                  \
+        dl->w[(b << 1)] = decision ? m0 - m1 : m1 - m0;                     \
+        d->w[b >> 2] |= decision << (((b << 1)) & 7);                       \
+                                                                            \
+        m0 -= (metric + metric - 2);                                        \
+        m1 += (metric + metric - 2);                                        \
+        decision = m0 > m1;                                                 \
+        vp->new_metrics->w[(b << 1) + 1] = decision ? m1 : m0;              \
+        dl->w[(b << 1) + 1] = decision ? m0 - m1 : m1 - m0;                 \
+        d->w[b >> 2] |= decision << (((b << 1) + 1) & 7);                   \
+    } while (0)
+
+#define BUTTERFLIES(BF)                                                     \
+    do {                                                                    \
+        BF(0);  BF(1);  BF(2);  BF(3);  BF(4);  BF(5);  BF(6);  BF(7);      \
+        BF(8);  BF(9);  BF(10); BF(11); BF(12); BF(13); BF(14); BF(15);     \
+        BF(16); BF(17); BF(18); BF(19); BF(20); BF(21); BF(22); BF(23);     \
+        BF(24); BF(25); BF(26); BF(27); BF(28); BF(29); BF(30); BF(31);     \
+    } while (0)
+
 /* 
  * Update decoder with a block of demodulated symbols
  * Note that nbits is the number of decoded data bits, not the number
@@ -212,7 +350,7 @@ int update_viterbi(void *p, uint8_t *syms, uint16_t nbits)
 {
     struct v27 *vp = p;
     void *tmp;
-    decision_t *dp, *d = &decisions_local;
+    decision_t *dp, decisions_local, *d = &decisions_local;
     uint16_t i = 0;
     uint8_t m0, m1, decision, metric, sym0, sym1;
 
@@ -231,38 +369,13 @@ int update_viterbi(void *p, uint8_t *syms, uint16_t nbits)
         i += 2;
 
         /* Unrolled butterflies */
-        BFLY(0);
-        BFLY(1);
-        BFLY(2);
-        BFLY(3);
-        BFLY(4);
-        BFLY(5);
-        BFLY(6);
-        BFLY(7);
-        BFLY(8);
-        BFLY(9);
-        BFLY(10);
-        BFLY(11);
-        BFLY(12);
-        BFLY(13);
-        BFLY(14);
-        BFLY(15);
-        BFLY(16);
-        BFLY(17);
-        BFLY(18);
-        BFLY(19);
-        BFLY(20);
-        BFLY(21);
-        BFLY(22);
-        BFLY(23);
-        BFLY(24);
-        BFLY(25);
-        BFLY(26);
-        BFLY(27);
-        BFLY(28);
-        BFLY(29);
-        BFLY(30);
-        BFLY(31);
+        BUTTERFLIES(BFLY);
+
+        if (unlikely(vp->known_mask != NULL))
+            apply_constraints(vp, dp - vp->decisions);
+
+        if (unlikely(vp->new_metrics->w[0] >= RENORM_THRESHOLD))
+            renormalize(vp);
 
         /* Writeback cached data */
         memcpy(dp++, d, sizeof(decision_t));
@@ -273,7 +386,211 @@ int update_viterbi(void *p, uint8_t *syms, uint16_t nbits)
         vp->new_metrics = tmp;
     }
 
-    vp->dp = d;
+    vp->dp = dp;
+    return 0;
+}
+
+/*
+ * Same as update_viterbi(), but also keeps the metric difference at every
+ * state and step, as needed by list_viterbi()
+ */
+int update_viterbi_soft(void *p, uint8_t *syms, uint16_t nbits)
+{
+    struct v27 *vp = p;
+    void *tmp;
+    decision_t *dp, decisions_local, *d = &decisions_local;
+    metric_t *dl;
+    uint16_t i = 0;
+    uint8_t m0, m1, decision, metric, sym0, sym1;
+
+    if (unlikely(p == NULL))
+        return -1;
+
+    dp = vp->dp;
+
+    while (likely(nbits--)) {
+        memset(d, 0, sizeof(decision_t));
+        dl = &vp->deltas[dp - vp->decisions];
+
+        sym0 = get_bit(syms, i);
+        sym1 = get_bit(syms, i + 1);
+        i += 2;
+
+        BUTTERFLIES(BFLY_SOFT);
+
+        if (unlikely(vp->known_mask != NULL))
+            apply_constraints(vp, dp - vp->decisions);
+
+        if (unlikely(vp->new_metrics->w[0] >= RENORM_THRESHOLD))
+            renormalize(vp);
+
+        memcpy(dp++, d, sizeof(decision_t));
+
+        tmp = vp->old_metrics;
+        vp->old_metrics = vp->new_metrics;
+        vp->new_metrics = tmp;
+    }
+
+    vp->dp = dp;
+    return 0;
+}
+
+#define get_decision(_vp, _step, _state) \
+    (((_vp)->decisions[_step].w[(_state) / 8] >> ((_state) & 7)) & 1)
+
+/*
+ * Trace survivors back from the given state after the given step down to
+ * the start of the block. Decoded bits are written to data and the visited
+ * states to path.
+ */
+static void traceback(struct v27 *vp, unsigned char *data, uint8_t *path,
+                      int step, unsigned int state, unsigned int nbits)
+{
+    for (; step >= 0; step--) {
+        path[step] = state;
+        if ((unsigned int)step < nbits) {
+            if (state & 1)
+                data[step >> 3] |= 0x80 >> (step & 7);
+            else
+                data[step >> 3] &= ~(0x80 >> (step & 7));
+        }
+        state = (state >> 1) | (get_decision(vp, step, state) << 5);
+    }
+}
+
+/*
+ * List Viterbi chainback (serial list Viterbi algorithm)
+ *
+ * Writes the nlist most likely paths ending in endstate to data, one block
+ * of (nbits + 7) / 8 bytes per path, and their path metrics to metrics, in
+ * order of increasing metric. Every path other than the best one is a
+ * deviation from an already listed path onto a discarded competitor, so it
+ * costs that path's metric plus the metric difference where they merge.
+ * Must be preceded by update_viterbi_soft(). Returns the number of paths
+ * listed, or -1 on error.
+ */
+int list_viterbi(void *p, unsigned char *data, int *metrics, unsigned int nbits,
+                 unsigned int endstate, int nlist)
+{
+    struct v27 *vp = p;
+    struct deviation *pool, *best, *slot;
+    uint8_t *path;
+    unsigned int nbytes = (nbits + 7) / 8;
+    int step, steps = nbits + VITERBI_CONSTRAINT - 1;
+    int n, i, j, npool = 0, nkeep, first, metric;
+    unsigned int state;
+    unsigned char *out;
+
+    if (unlikely(p == NULL || nlist < 1 || nlist > VITERBI_LIST_MAX))
+        return -1;
+
+    pool = malloc(nlist * nlist * sizeof(struct deviation));
+    path = malloc(steps);
+    if (pool == NULL || path == NULL) {
+        free(pool);
+        free(path);
+        return -1;
+    }
+
+    endstate %= 64;
+    metrics[0] = vp->old_metrics->w[endstate] + vp->renorm;
+    traceback(vp, data, path, steps - 1, endstate, nbits);
+    first = steps;
+
+    for (n = 0; ; ) {
+        /* Keep the best deviations from the path just listed. Only the
+         * part of the path before its own deviation may deviate again */
+        nkeep = nlist - 1 - n;
+        slot = &pool[npool];
+        for (i = 0, step = first - 1; step >= 0 && nkeep > 0; step--) {
+            metric = metrics[n] + vp->deltas[step].w[path[step]];
+            if (i < nkeep) {
+                j = i++;
+            } else if (metric < slot[i - 1].metric) {
+                j = i - 1;
+            } else {
+                continue;
+            }
+            for (; j > 0 && slot[j - 1].metric > metric; j--)
+                slot[j] = slot[j - 1];
+            slot[j].metric = metric;
+            slot[j].step = step;
+            slot[j].state = path[step];
+            slot[j].parent = n;
+        }
+        npool += i;
+
+        if (++n == nlist || npool == 0)
+            break;
+
+        /* The next path is the best pending deviation */
+        for (best = &pool[0], i = 1; i < npool; i++)
+            if (pool[i].metric < best->metric)
+                best = &pool[i];
+
+        out = &data[n * nbytes];
+        memcpy(out, &data[best->parent * nbytes], nbytes);
+        metrics[n] = best->metric;
+        first = best->step;
+        state = best->state;
+        state = (state >> 1) | ((get_decision(vp, first, state) ^ 1) << 5);
+        traceback(vp, out, path, first - 1, state, nbits);
+
+        *best = pool[--npool];
+    }
+
+    free(pool);
+    free(path);
+    return n;
+}
+
+/*
+ * Soft-output Viterbi (SOVA) reliabilities
+ *
+ * Writes one reliability value per decoded bit of the most likely path
+ * ending in endstate: the smallest metric difference to a competing path
+ * that merges with it within SOVA_WINDOW steps and decodes that bit
+ * differently, saturated at 255. Must be preceded by update_viterbi_soft().
+ */
+int sova_viterbi(void *p, unsigned char *reliability, unsigned int nbits,
+                 unsigned int endstate)
+{
+    struct v27 *vp = p;
+    uint8_t *path, delta;
+    int step, u, steps = nbits + VITERBI_CONSTRAINT - 1;
+    unsigned int state;
+
+    if (unlikely(p == NULL))
+        return -1;
+
+    if ((path = malloc(steps)) == NULL)
+        return -1;
+
+    /* Most likely path */
+    state = endstate % 64;
+    for (step = steps - 1; step >= 0; step--) {
+        path[step] = state;
+        state = (state >> 1) | (get_decision(vp, step, state) << 5);
+    }
+
+    memset(reliability, UINT8_MAX, nbits);
+
+    for (step = 1; step < steps; step++) {
+        delta = vp->deltas[step].w[path[step]];
+        state = path[step];
+        state = (state >> 1) | ((get_decision(vp, step, state) ^ 1) << 5);
+
+        /* Follow the competitor back until it merges with the path */
+        for (u = step - 1; u >= 0 && u >= step - SOVA_WINDOW; u--) {
+            if (state == path[u])
+                break;
+            if ((unsigned int)u < nbits && (state & 1) != (path[u] & 1) && delta < reliability[u])
+                reliability[u] = delta;
+            state = (state >> 1) | (get_decision(vp, u, state) << 5);
+        }
+    }
+
+    free(path);
     return 0;
 }
 
@@ -12,11 +12,18 @@
 #define VITERBI_CONSTRAINT	7
 #define VITERBI_TAIL		1
 #define VITERBI_RATE		2
+#define VITERBI_LIST_MAX	256
 
 void *create_viterbi(int16_t len);
 int init_viterbi(void *vp,int starting_state);
+int init_viterbi_dual(void *vp, int state_a, int state_b);
+int metric_viterbi(void *vp, unsigned int endstate);
+int constrain_viterbi(void *vp, const unsigned char *mask, const unsigned char *bits, unsigned int nbits);
 int update_viterbi(void *vp, unsigned char sym[], uint16_t npairs);
+int update_viterbi_soft(void *vp, unsigned char sym[], uint16_t npairs);
 int chainback_viterbi(void *vp, unsigned char *data, unsigned int nbits,unsigned int endstate);
+int list_viterbi(void *vp, unsigned char *data, int *metrics, unsigned int nbits, unsigned int endstate, int nlist);
+int sova_viterbi(void *vp, unsigned char *reliability, unsigned int nbits, unsigned int endstate);
 void delete_viterbi(void *vp);
 void encode_viterbi(unsigned char * channel, unsigned char * data, int framebits);
 
@@ -31,6 +31,16 @@ except ImportError:
 	pass
 
 # import any pure python here
-from aausat4_fec import aausat4_fec
-from aausat4_beacon_parser import aausat4_beacon_parser
+# offline decoding works without GNU Radio, so the blocks are only
+# skipped when GNU Radio itself is missing
+try:
+	from gnuradio import gr
+except ImportError:
+	gr = None
+
+if gr is not None:
+	from aausat4_fec import aausat4_fec
+	from aausat4_beacon_parser import aausat4_beacon_parser
+	from frame_log_sink import frame_log_sink
+	from frame_log_source import frame_log_source
 #
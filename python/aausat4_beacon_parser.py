@@ -27,18 +27,25 @@ import numpy
 from gnuradio import gr
 import pmt
 
+import time
+
 import beacon
+import archive
+import database
 
 class aausat4_beacon_parser(gr.basic_block):
     """
     docstring for block aausat4_beacon_parser
     """
-    def __init__(self):
+    def __init__(self, print_beacons=True, archive_path="", database_path=""):
         gr.basic_block.__init__(self,
             name="aausat4_beacon_parser",
             in_sig=[],
             out_sig=[])
 
+        self.print_beacons = print_beacons
+        self.archive = archive.Archive(archive_path) if archive_path else None
+        self.database = database.Database(database_path) if database_path else None
         self.message_port_register_in(pmt.intern('in'))
         self.set_msg_handler(pmt.intern('in'), self.handle_msg)
         self.message_port_register_out(pmt.intern('out'))
@@ -51,8 +58,37 @@ class aausat4_beacon_parser(gr.basic_block):
         packet = str(bytearray(pmt.u8vector_elements(msg)))
 
         try:
-            print(str(beacon.Beacon(packet[4:])))
+            b = beacon.Beacon(packet[4:])
         except ValueError as e:
             print e
+            return
+
+        if self.print_beacons:
+            print(str(b))
+
+        meta = pmt.car(msg_pmt)
+        if not pmt.is_dict(meta):
+            meta = pmt.make_dict()
+
+        rx_time = pmt.to_python(pmt.dict_ref(meta, pmt.intern('rx_time'), pmt.from_double(time.time())))
+        if self.archive:
+            try:
+                self.archive.append(packet[4:], rx_time)
+            except Exception as e:
+                print e
+        if self.database:
+            try:
+                self.database.add(b, rx_time)
+            except Exception as e:
+                print e
+
+        self.message_port_pub(pmt.intern('out'), pmt.cons(meta, pmt.to_pmt(b.to_dict())))
+
+    def stop(self):
+        if self.archive:
+            self.archive.close()
+        if self.database:
+            self.database.close()
+        return True
 
 
@@ -27,53 +27,126 @@ import numpy
 from gnuradio import gr
 import pmt
 import array
+import time
 
 import fec
 
+SYNCWORD = numpy.array([int(b) for b in fec.SYNCWORD], dtype=numpy.uint8)
+
+# maximum verbose messages per second
+LOG_RATE = 20
+
+# a serialized u8vector starts with the type, the vector type, a 32 bit
+# length, the number of padding bytes (always 1) and the padding
+U8VECTOR_HEADER = 8
+
+def u8vector_buffer(msg):
+    # Read-only numpy view of the contents of a u8vector. Going through the
+    # serialized PMT avoids building a Python list of its elements.
+    serialized = pmt.serialize_str(msg)
+    if len(serialized) - U8VECTOR_HEADER != pmt.length(msg):
+        return numpy.array(pmt.u8vector_elements(msg), dtype=numpy.uint8)
+    return numpy.frombuffer(serialized, dtype=numpy.uint8, offset=U8VECTOR_HEADER)
+
 class aausat4_fec(gr.basic_block):
     """
     docstring for block aausat4_fec
     """
-    def __init__(self, verbose):
+    def __init__(self, verbose, sync_slip=0, either_polarity=False, gate=False, gate_sigmas=fec.GATE_SIGMAS):
         gr.basic_block.__init__(self,
             name="aausat4_fec",
             in_sig=[],
             out_sig=[])
 
         self.verbose = verbose
+        self.logger = gr.logger("aausat4_fec")
+        self.log_window = 0
+        self.log_count = 0
+        self.log_suppressed = 0
+        # sync offsets to try, in bits: 0, -1, 1, -2, 2... They are decoded
+        # one after another, nearest first, until one decodes
+        self.offsets = [0] + [sign * n for n in range(1, sync_slip + 1) for sign in (-1, 1)]
         self.message_port_register_in(pmt.intern('in'))
         self.set_msg_handler(pmt.intern('in'), self.handle_msg)
         self.message_port_register_out(pmt.intern('out'))
 
-        self.ec = fec.PacketHandler()
+        self.ec = fec.PacketHandler(either_polarity=either_polarity, gate=gate, gate_sigmas=gate_sigmas)
 
     def handle_msg(self, msg_pmt):
+        start = time.time()
         msg = pmt.cdr(msg_pmt)
         if not pmt.is_u8vector(msg):
-            print "[ERROR] Received invalid message type. Expected u8vector"
+            self.logger.error("Received invalid message type. Expected u8vector")
             return
-        packet = str(bytearray(pmt.u8vector_elements(msg)))
+        packet = u8vector_buffer(msg)
 
-        data = None
-        try:
-            if self.verbose:
-                print "Trying to decode as long packet: 250 FEC bytes, 92 data bytes"
-            (data, bit_corr, byte_corr) = self.ec.decode(packet[1:])
-        except Exception as ex:
-            if self.verbose: print(ex)
-            try:
+        bits = None
+        for offset in self.offsets:
+            if offset:
                 if self.verbose:
-                    print "Trying to decode as short packet: 128 FEC bytes, 31 data bytes"
-                (data, bit_corr, byte_corr) = self.ec.decode(packet[1:1 + 128])
-            except Exception as ex:
-                if self.verbose: print(ex)
+                    self.log("Trying sync offset {} bits".format(offset))
+                if bits is None:
+                    bits = numpy.unpackbits(packet)
+                packet = self.slip(bits, offset)
+            (frame_type, data, bit_corr, byte_corr) = self.decode(packet)
+            if data:
+                break
 
         if data:
             if self.verbose:
-                print "FEC decoded OK. Bit errors: {}. Byte errors {}".format(bit_corr,
-                                                                              byte_corr)
+                self.log("FEC decoded OK. Bit errors: {}. Byte errors {}".format(bit_corr,
+                                                                                 byte_corr))
             data = data[:-2] # strip out HMAC
+            meta = pmt.car(msg_pmt)
+            if not pmt.is_dict(meta):
+                meta = pmt.make_dict()
+            meta = pmt.dict_add(meta, pmt.intern('frame_type'), pmt.intern(frame_type))
+            meta = pmt.dict_add(meta, pmt.intern('bit_corrections'), pmt.from_long(bit_corr))
+            meta = pmt.dict_add(meta, pmt.intern('byte_corrections'), pmt.from_long(byte_corr))
+            meta = pmt.dict_add(meta, pmt.intern('path_metric'), pmt.from_long(self.ec.path_metric))
+            meta = pmt.dict_add(meta, pmt.intern('sync_offset'), pmt.from_long(offset))
+            meta = pmt.dict_add(meta, pmt.intern('inverted'), pmt.from_bool(self.ec.inverted))
+            # keep the receive time of recorded frames replayed from upstream
+            if not pmt.dict_has_key(meta, pmt.intern('rx_time')):
+                meta = pmt.dict_add(meta, pmt.intern('rx_time'), pmt.from_double(start))
+            meta = pmt.dict_add(meta, pmt.intern('decode_latency'), pmt.from_double(time.time() - start))
             self.message_port_pub(pmt.intern('out'),
-                                  pmt.cons(pmt.PMT_NIL,
+                                  pmt.cons(meta,
                                            pmt.init_u8vector(len(data), bytearray(data))))
 
+    def log(self, message):
+        # Verbose output, limited to LOG_RATE messages per second so that
+        # troubleshooting does not hold up the message thread
+        now = time.time()
+        if now - self.log_window >= 1.0:
+            if self.log_suppressed:
+                self.logger.info("{} messages suppressed".format(self.log_suppressed))
+            self.log_window = now
+            self.log_count = 0
+            self.log_suppressed = 0
+
+        if self.log_count < LOG_RATE:
+            self.log_count += 1
+            self.logger.info(message)
+        else:
+            self.log_suppressed += 1
+
+    def slip(self, bits, offset):
+        # Realign the packet as if the syncword had been found offset bits
+        # later. Bits before the packet are the end of the syncword.
+        if offset > 0:
+            bits = numpy.concatenate((bits[offset:], numpy.zeros(offset, dtype=numpy.uint8)))
+        else:
+            bits = numpy.concatenate((SYNCWORD[offset:], bits[:offset]))
+        return numpy.packbits(bits)
+
+    def decode(self, packet):
+        for frame_type, frame, description in fec.FRAMES:
+            try:
+                if self.verbose:
+                    self.log("Trying to decode as {} packet: {}".format(frame_type, description))
+                return (frame_type,) + self.ec.decode(packet[frame])
+            except Exception as ex:
+                if self.verbose: self.log(str(ex))
+
+        return None, None, None, None
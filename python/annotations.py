@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import json
+import os
+
+## SigMF annotations
+# Frames found in a recording are described in a SigMF metadata file next to it
+# (recording.sigmf-meta), with one annotation per frame holding its sample range,
+# frame type, FEC corrections and status. FEC experiments can then decode again
+# only the annotated ranges instead of the whole recording.
+#
+# Recordings are not renamed to .sigmf-data, so the metadata names the recording
+# in core:dataset, and core:header_bytes skips the WAV header.
+
+META_SUFFIX = ".sigmf-meta"
+SIGMF_VERSION = "1.0.0"
+
+# frame keys written as annotation fields
+FIELDS = ("frame_type", "status", "sync_errors", "bit_corrections", "byte_corrections")
+
+def meta_path(path):
+    return os.path.splitext(path)[0] + META_SUFFIX
+
+def write(path, frames, datatype, sample_rate=None, header_bytes=0):
+    """Write frames (as returned by the offline decoder) as annotations of path"""
+    meta = {"global" : {"core:datatype" : datatype, "core:version" : SIGMF_VERSION,
+                        "core:dataset" : os.path.basename(path),
+                        "core:description" : "AAUSAT-4 frames"},
+            "captures" : [{"core:sample_start" : 0, "core:header_bytes" : header_bytes}],
+            "annotations" : []}
+    if sample_rate:
+        meta["global"]["core:sample_rate"] = sample_rate
+    for frame in sorted(frames, key=lambda f: f["position"]):
+        annotation = {"core:sample_start" : frame["position"], "core:sample_count" : frame["length"],
+                      "core:label" : frame.get("frame_type", frame["status"])}
+        for field in FIELDS:
+            if field in frame:
+                annotation["aausat:" + field] = frame[field]
+        meta["annotations"].append(annotation)
+    with open(meta_path(path), "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+
+def read(path):
+    """Annotations of path, as a list of dictionaries"""
+    with open(meta_path(path)) as f:
+        return json.load(f)["annotations"]
+
+def segments(path, margin, length):
+    """Annotated sample ranges, widened by margin and merged, as a list of (start, stop)"""
+    merged = []
+    for a in sorted(read(path), key=lambda a: a["core:sample_start"]):
+        start = max(a["core:sample_start"] - margin, 0)
+        stop = min(a["core:sample_start"] + a["core:sample_count"] + margin, length)
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
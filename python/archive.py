@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import os
+
+import numpy
+
+import beacon
+
+## Telemetry archive
+# Decoded beacons are stored in a directory with one subdirectory per subsystem
+# and, inside it, one file per column: the receive time, the EPS real time
+# clock of the beacon and each field of the subsystem, already scaled. Columns
+# are fixed width little-endian arrays, so a reader only maps the columns it
+# needs. Only valid subsystems are stored.
+#
+# Files are only appended to, so they can be memory-mapped by readers while a
+# flowgraph is writing. Rows are kept in receive time order, so time ranges are
+# found by binary search on the memory-mapped rx_time column. Beacons without a
+# valid EPS subsystem store the last EPS clock received before them, which
+# keeps the rt_clock column in order as well. Columns left with different
+# lengths by an interrupted write are truncated to the complete rows when the
+# archive is opened.
+
+HEADER_COLUMNS = [("rx_time", numpy.dtype("<f8"), ()), ("rt_clock", numpy.dtype("<u4"), ())]
+
+def column_dtypes(schema):
+    # (column, dtype, shape) for each subsystem, from the bulk decoder
+    columns, masks = schema.parse_many(b"\x00" * schema.length)
+    dtypes = {}
+    for name, cls, offset, bit, fields in schema.subsystems:
+        dtypes[name] = list(HEADER_COLUMNS)
+        for field in cls.FIELDS:
+            if field in [c[0] for c in HEADER_COLUMNS]:
+                continue
+            column = columns[name][field]
+            dtypes[name].append((field, column.dtype.newbyteorder("<"), column.shape[1:]))
+    return dtypes
+
+class Archive(object):
+    """Append-only memory-mapped columnar archive of decoded beacons in directory"""
+    def __init__(self, directory, schema=beacon.SCHEMA):
+        self.directory = directory
+        self.schema = schema
+        self.dtypes = column_dtypes(schema)
+        for name in self.dtypes:
+            if not os.path.isdir(os.path.join(directory, name)):
+                os.makedirs(os.path.join(directory, name))
+        self.files = {}
+        for name in self.dtypes:
+            self.truncate_rows(name)
+        self.last_time = max([self.last_value(name, "rx_time", float("-inf")) for name in self.dtypes])
+        self.last_clock = self.last_value("EPS", "rt_clock", 0)
+
+    def path(self, name, column):
+        return os.path.join(self.directory, name, column + ".dat")
+
+    def column_rows(self, name, column):
+        # complete rows in a column file
+        dtype, shape = self.column_dtype(name, column)
+        path = self.path(name, column)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        return size // (dtype.itemsize * int(numpy.prod(shape)))
+
+    def column_dtype(self, name, column):
+        for c, dtype, shape in self.dtypes[name]:
+            if c == column:
+                return dtype, shape
+        raise Exception("Unknown archive column {}.{}".format(name, column))
+
+    def truncate_rows(self, name):
+        # cut every column to the rows present in all of them
+        rows = min([self.column_rows(name, column) for column, dtype, shape in self.dtypes[name]])
+        for column, dtype, shape in self.dtypes[name]:
+            path = self.path(name, column)
+            if os.path.exists(path) and self.column_rows(name, column) > rows:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * dtype.itemsize * int(numpy.prod(shape)))
+
+    def last_value(self, name, column, default):
+        values = self.read(name, fields=[column])[column]
+        return values[-1] if len(values) else default
+
+    def append(self, data, rx_time):
+        """Append one or more concatenated beacons, received at rx_time
+
+        rx_time is a number or an array with one time per beacon. Times must not
+        go backwards.
+        """
+        columns, masks = self.schema.parse_many(data)
+        rx_time = numpy.broadcast_to(numpy.asarray(rx_time, dtype=numpy.float64), masks["EPS"].shape)
+        if len(rx_time) == 0:
+            return
+        if rx_time[0] < self.last_time or numpy.any(numpy.diff(rx_time) < 0):
+            raise Exception("Archive records must be appended in receive time order")
+        # carry the last valid EPS clock forward over beacons without EPS
+        last_eps = numpy.maximum.accumulate(numpy.where(masks["EPS"], numpy.arange(len(rx_time)), -1))
+        rt_clock = numpy.where(last_eps >= 0, columns["EPS"]["rt_clock"][last_eps], self.last_clock)
+        header = {"rx_time" : rx_time, "rt_clock" : rt_clock}
+
+        for name, dtypes in self.dtypes.items():
+            rows = masks[name]
+            for column, dtype, shape in dtypes:
+                values = header[column] if column in header else columns[name][column]
+                key = (name, column)
+                if key not in self.files:
+                    self.files[key] = open(self.path(name, column), "ab")
+                self.files[key].write(numpy.ascontiguousarray(values[rows], dtype=dtype).tobytes())
+                self.files[key].flush()
+        self.last_time = rx_time[-1]
+        self.last_clock = rt_clock[-1]
+
+    def read(self, name, start=None, stop=None, clock="rx_time", fields=None):
+        """Columns of subsystem name with start <= clock < stop
+
+        Returns {column: array} for the given fields (all columns by default).
+        The arrays are read-only views of the memory-mapped column files. clock
+        can be rx_time or rt_clock; ranges on rt_clock assume that the
+        satellite clock has been increasing over the archived period.
+        """
+        names = [column for column, dtype, shape in self.dtypes[name] if fields is None or column in fields]
+        rows = min([self.column_rows(name, column) for column in names + [clock]])
+        first, last = 0, rows
+        if rows and (start is not None or stop is not None):
+            times = self.column(name, clock, rows)
+            first = numpy.searchsorted(times, start) if start is not None else 0
+            last = numpy.searchsorted(times, stop) if stop is not None else rows
+        return dict((column, self.column(name, column, rows)[first:last]) for column in names)
+
+    def column(self, name, column, rows):
+        dtype, shape = self.column_dtype(name, column)
+        if rows == 0:
+            return numpy.zeros((0,) + shape, dtype=dtype)
+        return numpy.memmap(self.path(name, column), dtype=dtype, mode="r", shape=(rows,) + shape)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
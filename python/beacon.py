@@ -1,6 +1,9 @@
 from datetime import datetime
+import re
 import struct
 
+import numpy
+
 BEACON_LENGTH = 84
 EPS_LENGTH = 20
 COM_LENGTH = 10
@@ -10,19 +13,174 @@ ADCS1_LENGTH = 7
 ADCS2_LENGTH = 6
 AIS_LENGTH = 20
 
-class EPS(object):
-    def __init__(self, eps_data):
-        if len(eps_data) != EPS_LENGTH:
-            raise InputException(len(eps_data), EPS_LENGTH)
+# offsets in the beacon, after the valid byte
+EPS_OFFSET = 1
+COM_OFFSET = EPS_OFFSET + EPS_LENGTH
+ADCS1_OFFSET = COM_OFFSET + COM_LENGTH
+ADCS2_OFFSET = ADCS1_OFFSET + ADCS1_LENGTH
+AIS1_OFFSET = ADCS2_OFFSET + ADCS2_LENGTH
+AIS2_OFFSET = AIS1_OFFSET + AIS_LENGTH
+
+## Field layouts
+# Each field is (name, format[, scale[, mask]]), where format is a big-endian
+# struct code, optionally with a repeat count (repeated fields decode as tuples).
+# Fields named None are skipped; use them for padding and unknown bytes.
+# Fields are laid out consecutively from the offset of their subsystem.
+
+EPS_FIELDS = (
+    ("boot_count", "H"),
+    ("uptime", "I"),
+    ("rt_clock", "I"),
+    ("ping_status", "B"),
+    ("subsystem_status", "H"),
+    ("battery_voltage", "B", 40),
+    ("cell_diff", "b", 4),
+    ("battery_current", "b", 10),
+    ("solar_power", "B", 20),
+    ("temp", "b"),
+    ("pa_temp", "b"),
+    ("main_voltage", "b"),
+)
+
+COM_FIELDS = (
+    ("boot_count", "H", 1, 0x1fff),
+    ("packets_received", "H"),
+    ("packets_send", "H"),
+    ("latest_rssi", "h"),
+    ("latest_bit_correction", "B"),
+    ("latest_byte_correction", "B"),
+)
+
+# reverse engineered
+ADCS1_FIELDS = (
+    ("bdot", "3h"),
+    ("state", "B"),
+)
+
+ADCS2_FIELDS = (
+    ("gyro", "3h"),
+)
+
+# there are some fields which apparently are 0 all the time
+# this fields can't be identified by reverse engineering
+AIS_FIELDS = (
+    ("boot_count", "H"),
+    (None, "4x"),
+    ("unique_mssi", "H"),
+    (None, "12x"),
+)
+
+def field_names(fields):
+    return tuple(field[0] for field in fields if field[0] is not None)
+
+NUMPY_TYPES = {"B" : "u1", "b" : "i1", "H" : ">u2", "h" : ">i2", "I" : ">u4", "i" : ">i4"}
+
+class Schema(object):
+    """Beacon layout compiled from a table of subsystems
+
+    subsystems is a sequence of (name, class, offset, valid bit, fields). The layout
+    is compiled once into a single struct for the scalar path and a numpy dtype for
+    the bulk path, so that both decode and scale fields in the same way.
+    """
+    def __init__(self, length, subsystems):
+        self.length = length
+        self.subsystems = subsystems
+        self.layout = dict((s[0], s) for s in subsystems)
+        # per subsystem list of (field name, index in the unpacked values, repeat count)
+        self.fields = {}
+        # list of (subsystem, field name, index in the unpacked values, repeat count, scale, mask)
+        self.scaling = []
+
+        fmt = ">B" # valid byte
+        dtype = {"names" : ["valid"], "formats" : ["u1"], "offsets" : [0], "itemsize" : length}
+        position = 1
+        index = 1
+        for name, cls, offset, bit, fields in subsystems:
+            if offset < position:
+                raise Exception("Subsystem {} overlaps the previous one".format(name))
+            fmt += "{}x".format(offset - position) if offset > position else ""
+            position = offset
+            self.fields[name] = []
+            for field in fields:
+                fname, code = field[:2]
+                scale = field[2] if len(field) > 2 else 1
+                mask = field[3] if len(field) > 3 else None
+                count, base = re.match(r"(\d*)(\w)$", code).groups()
+                count = int(count) if count else 1
+                fmt += code
+                if fname is not None:
+                    dtype["names"].append("{}.{}".format(name, fname))
+                    dtype["formats"].append((NUMPY_TYPES[base], (count,) if count > 1 else ()))
+                    dtype["offsets"].append(position)
+                    self.fields[name].append((fname, index, count))
+                    if scale != 1 or mask is not None:
+                        self.scaling.append((name, fname, index, count, scale, mask))
+                    index += count
+                position += struct.calcsize(">" + code)
+        if position > length:
+            raise Exception("Subsystems exceed the beacon length")
+        fmt += "{}x".format(length - position) if length > position else ""
+
+        self.struct = struct.Struct(fmt)
+        self.dtype = numpy.dtype(dtype)
+
+    def unpack(self, data):
+        """Decode all fields of a beacon with a single unpack
 
-        self.boot_count, self.uptime, self.rt_clock, self.ping_status, self.subsystem_status,\
-        self.battery_voltage, self.cell_diff, self.battery_current, self.solar_power,\
-        self.temp, self.pa_temp, self.main_voltage = struct.unpack(">HIIBHBbbBbbb", eps_data)
+        Returns (valid byte, {subsystem: tuple of field values}).
+        """
+        values = list(self.struct.unpack_from(data))
+        for name, fname, i, count, scale, mask in self.scaling:
+            for j in range(i, i + count):
+                values[j] *= scale
+                if mask is not None:
+                    values[j] &= mask
+        subsystems = {}
+        for name, fields in self.fields.items():
+            subsystems[name] = tuple(values[i] if count == 1 else tuple(values[i:i+count])
+                                     for fname, i, count in fields)
+        return values[0], subsystems
 
-        self.battery_voltage *= 40
-        self.cell_diff *= 4
-        self.battery_current *= 10
-        self.solar_power *= 20
+    def parse_many(self, buf, count=-1):
+        """Decode count concatenated beacons from buf (all of them if count is -1)
+
+        Returns a dictionary of columns {subsystem: {field: array}} and a dictionary of
+        validity masks {subsystem: array}. Columns are decoded for every beacon; the masks
+        tell which rows are valid.
+        """
+        beacons = numpy.frombuffer(buf, dtype=self.dtype, count=count)
+        valid = beacons["valid"]
+        columns = {}
+        masks = {}
+        for name, cls, offset, bit, fields in self.subsystems:
+            columns[name] = {}
+            for fname, i, n in self.fields[name]:
+                column = beacons["{}.{}".format(name, fname)]
+                columns[name][fname] = column.astype(column.dtype.base.newbyteorder("="))
+            masks[name] = (valid & bit) != 0
+        for name, fname, i, count, scale, mask in self.scaling:
+            column = columns[name][fname]
+            if scale != 1:
+                column = column.astype(numpy.int32) * scale
+            if mask is not None:
+                column &= mask
+            columns[name][fname] = column
+        return columns, masks
+
+class Subsystem(object):
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, values):
+        for field, value in zip(self.FIELDS, values):
+            setattr(self, field, value)
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+class EPS(Subsystem):
+    FIELDS = field_names(EPS_FIELDS)
+    __slots__ = FIELDS
 
     def __str__(self):
         eps_str = ("""EPS:
@@ -42,14 +200,10 @@ class EPS(object):
         return eps_str
 
 
-class COM(object):
-    def __init__(self, com_data):
-        self.boot_count, self.packets_received, self.packets_send, self.latest_rssi,\
-        self.latest_bit_correction, self.latest_byte_correction = \
-                          struct.unpack(">HHHhBB", com_data)
+class COM(Subsystem):
+    FIELDS = field_names(COM_FIELDS)
+    __slots__ = FIELDS
 
-        self.boot_count &= 0x1fff
-        
     def __str__(self):
         com_str = ("""COM:
         Boot count:\t\t{0}
@@ -64,11 +218,9 @@ class COM(object):
         return com_str
 
 # Reverse engineered classes
-class ADCS1(object):
-    def __init__(self, adcs1_data):
-        data = struct.unpack(">hhhB", adcs1_data)
-        self.bdot = tuple(data[0:3])
-        self.state = data[3]
+class ADCS1(Subsystem):
+    FIELDS = field_names(ADCS1_FIELDS)
+    __slots__ = FIELDS
 
     def __str__(self):
         adcs1_str = ("""ADCS1:
@@ -77,9 +229,9 @@ class ADCS1(object):
 
         return adcs1_str
 
-class ADCS2(object):
-    def __init__(self, adcs2_data):
-        self.gyro = tuple(struct.unpack(">hhh", adcs2_data))
+class ADCS2(Subsystem):
+    FIELDS = field_names(ADCS2_FIELDS)
+    __slots__ = FIELDS
 
     def __str__(self):
         adcs2_str = ("""ADCS2:
@@ -87,11 +239,9 @@ class ADCS2(object):
 
         return adcs2_str
 
-class AIS(object):
-    def __init__(self, ais_data):
-        # there are some fields which apparently are 0 all the time
-        # this fields can't be identified by reverse engineering
-        self.boot_count, _, _, self.unique_mssi, _ = struct.unpack(">HhhH12s", ais_data)
+class AIS(Subsystem):
+    FIELDS = field_names(AIS_FIELDS)
+    __slots__ = FIELDS
 
     def __str__(self):
         ais_str = ("""AIS:
@@ -112,48 +262,69 @@ class AIS(object):
 # The remaining fields seem to have the correct length
 
 #
-# For each subsystem, which are valid, are the corresponding data bytes passed to another
-# class which parses the information.
+# The whole beacon is decoded with a single unpack using the compiled schema. For each
+# subsystem, which are valid, are the corresponding fields passed to another class
+# which holds the information. This is done on first access to the subsystem,
+# either as an attribute (beacon.EPS) or through the subsystems dictionary, so that
+# objects are only built for the subsystems that are read.
 #
 # The __str__ method returns a human readable string with key information from the beacon
+
+# reverse engineered valid bits
+# EPS and COM are known from university team code
+# valid byte is usually 0x27
+# in DK3WN's blog we see that EPS, COM, AIS2 and ADCS1 are valid
+SUBSYSTEMS = (
+    ("EPS", EPS, EPS_OFFSET, 1 << 0, EPS_FIELDS),
+    ("COM", COM, COM_OFFSET, 1 << 1, COM_FIELDS),
+    ("ADCS1", ADCS1, ADCS1_OFFSET, 1 << 2, ADCS1_FIELDS),
+    ("ADCS2", ADCS2, ADCS2_OFFSET, 1 << 3, ADCS2_FIELDS),
+    ("AIS1", AIS, AIS1_OFFSET, 1 << 4, AIS_FIELDS),
+    ("AIS2", AIS, AIS2_OFFSET, 1 << 5, AIS_FIELDS),
+)
+SCHEMA = Schema(BEACON_LENGTH, SUBSYSTEMS)
+
 class Beacon(object):
+    __slots__ = ("raw_data", "valid", "values", "decoded")
     
     def __init__(self, raw_data):
         if len(raw_data) != BEACON_LENGTH:
             raise ValueError("Malformed beacon (incorrect length)")
 
-        self.subsystems = {}
-
-        valid, eps_raw, com_raw, adcs1_raw, adcs2_raw, ais1_raw, ais2_raw = \
-          struct.unpack(("B"+"{}s"*6).format(EPS_LENGTH, COM_LENGTH, ADCS1_LENGTH, ADCS2_LENGTH, AIS_LENGTH, AIS_LENGTH), raw_data)
-
-        # reverse engineered valid bits
-        # EPS and COM are known from university team code
-        # valid byte is usually 0x27
-        # in DK3WN's blog we see that EPS, COM, AIS2 and ADCS1 are valid
-        eps_valid = valid & (1 << 0)
-        com_valid = valid & (1 << 1)
-        adcs1_valid = valid & (1 << 2)
-        adcs2_valid = valid & (1 << 3)
-        ais1_valid = valid & (1 << 4)
-        ais2_valid = valid & (1 << 5)
-        
-        if eps_valid:
-            self.subsystems['EPS'] = EPS(eps_raw)
-        if com_valid:
-            self.subsystems['COM'] = COM(com_raw)
-        if adcs1_valid:
-            self.subsystems['ADCS1'] = ADCS1(adcs1_raw)
-        if adcs2_valid:
-            self.subsystems['ADCS2'] = ADCS2(adcs2_raw)
-        if ais1_valid:
-            self.subsystems['AIS1'] = AIS(ais1_raw)
-        if ais2_valid:
-            self.subsystems['AIS2'] = AIS(ais2_raw)
-        
+        self.raw_data = raw_data
+        self.valid, self.values = SCHEMA.unpack(raw_data)
+        self.decoded = {}
+
+    def __getattr__(self, name):
+        # build subsystems on first access; None if not valid
+        if name not in SCHEMA.layout:
+            raise AttributeError(name)
+        if name not in self.decoded:
+            name, cls, offset, bit, fields = SCHEMA.layout[name]
+            self.decoded[name] = cls(self.values[name]) if self.valid & bit else None
+        return self.decoded[name]
+
+    @property
+    def subsystems(self):
+        return dict((s[0], getattr(self, s[0])) for s in SCHEMA.subsystems if self.valid & s[3])
+
+    def to_dict(self):
+        return dict((name, subsystem.to_dict()) for name, subsystem in self.subsystems.items())
+
     def __str__(self):
         beacon_str = ""
         for k,v in self.subsystems.items():
             beacon_str += str(v) + "\n"
         return  beacon_str
 
+
+## Bulk decoding
+# parse_many views a buffer of concatenated beacons as a numpy structured array
+# with the layout above and decodes every field as a column, applying the same
+# scaling as the subsystem classes. This avoids creating Python objects per beacon
+# when reprocessing large numbers of recorded beacons.
+
+def parse_many(buf, count=-1):
+    return SCHEMA.parse_many(buf, count)
+
+parse_many.__doc__ = Schema.parse_many.__doc__
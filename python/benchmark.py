@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import binascii
+import ctypes
+import platform
+import random
+import time
+import timeit
+
+import numpy
+
+import beacon
+import fec
+import offline
+
+## Benchmarks
+# Throughput of the FEC chain and the beacon parser. The inputs are fec.TESTDATA
+# (a short frame) and a long frame with a beacon. If a recording is given (such as
+# examples/aausat-4.wav in the source tree), its decoding is also timed and the
+# long frame carries its beacon; otherwise the long frame carries BEACON.
+#
+# Each benchmark is run repeat times and the best run is kept, as it is the one
+# least disturbed by other load on the machine. Results are plain numbers with a
+# unit, so that they can be stored as JSON and compared across builds.
+
+REPEAT = 5
+# calls per run, multiplied by the scale argument of run()
+CALLS = 100
+# bytes corrupted in the RS block for decode_rs timings
+RS_ERRORS = (0, 2, 4, 8, 12, 16)
+# beacons in the buffer decoded by beacon.parse_many
+BULK_BEACONS = 10000
+
+# CSP header and beacon with EPS, COM, ADCS1 and AIS2 valid, used without a recording
+BEACON = b"\x00" * fec.CSP_OVERHEAD + b"\x27" + bytes(bytearray(range(beacon.BEACON_LENGTH - 1)))
+
+def best(function, calls, repeat):
+    # seconds per call in the best run
+    return min(timeit.repeat(function, number=calls, repeat=repeat)) / calls
+
+def result(value, unit):
+    return {"value" : value, "unit" : unit}
+
+def viterbi(frame, calls, repeat):
+    """update_viterbi and chainback_viterbi throughput for frame, in decoded Mbit/s"""
+    ec = fec.PacketHandler()
+    rx_length = len(frame) // fec.VITERBI_RATE - fec.VITERBI_TAIL
+    nbits = rx_length * fec.BITS_PER_BYTE
+    symbols = ctypes.create_string_buffer(frame, len(frame))
+    output = ctypes.create_string_buffer(rx_length)
+
+    def update():
+        fec.bbfec.init_viterbi(ec.vp, 0)
+        fec.bbfec.update_viterbi(ec.vp, symbols, nbits + fec.VITERBI_CONSTRAINT - 1)
+
+    def chainback():
+        fec.bbfec.chainback_viterbi(ec.vp, output, nbits, 0)
+
+    t_update = best(update, calls, repeat)
+    t_chainback = best(chainback, calls, repeat)
+    return {"update" : result(nbits / t_update / 1e6, "Mbit/s"),
+            "chainback" : result(nbits / t_chainback / 1e6, "Mbit/s")}
+
+def rs(data, calls, repeat):
+    """decode_rs time against the number of corrupted bytes, in microseconds"""
+    ec = fec.PacketHandler(viterbi=False, randomize=False)
+    codeword = bytearray(ec.encode(data))
+    pad = fec.RS_BLOCK_LENGTH - len(codeword)
+    buf = ctypes.create_string_buffer(len(codeword))
+    results = {}
+    for errors in RS_ERRORS:
+        rng = random.Random(errors)
+        corrupted = bytearray(codeword)
+        for i in rng.sample(range(len(corrupted)), errors):
+            corrupted[i] ^= rng.randint(1, 255)
+        corrupted = bytes(corrupted)
+        ctypes.memmove(buf, corrupted, len(corrupted))
+        if fec.bbfec.decode_rs(buf, None, 0, pad) != errors:
+            raise Exception("decode_rs failed with {} errors".format(errors))
+
+        def decode():
+            ctypes.memmove(buf, corrupted, len(corrupted))
+            fec.bbfec.decode_rs(buf, None, 0, pad)
+
+        results["errors_{}".format(errors)] = result(best(decode, calls, repeat) * 1e6, "us")
+    return results
+
+def packet_handler(frames, data, calls, repeat):
+    """PacketHandler.decode and encode throughput, in frames per second"""
+    ec = fec.PacketHandler()
+    results = {}
+    for name, frame in frames:
+        results["decode_" + name] = result(1 / best(lambda: ec.decode(frame), calls, repeat), "frames/s")
+    results["encode"] = result(1 / best(lambda: ec.encode(data), calls, repeat), "frames/s")
+    return results
+
+def fec_block(frame, calls, repeat):
+    """aausat4_fec message handler throughput, and its overhead over PacketHandler.decode"""
+    import pmt
+    from aausat4_fec import aausat4_fec
+
+    block = aausat4_fec(False)
+    # the packet after the syncword has a byte before the FEC frame
+    packet = bytearray(b"\x00" + frame)
+    msg = pmt.cons(pmt.PMT_NIL, pmt.init_u8vector(len(packet), packet))
+    t_block = best(lambda: block.handle_msg(msg), calls, repeat)
+    t_decode = best(lambda: block.ec.decode(frame), calls, repeat)
+    return {"handle_msg" : result(1 / t_block, "frames/s"),
+            "overhead" : result((t_block - t_decode) * 1e6, "us")}
+
+def parser(raw, calls, repeat):
+    """Beacon parsing throughput, in beacons per second"""
+    bulk = raw * BULK_BEACONS
+    return {"beacon" : result(1 / best(lambda: beacon.Beacon(raw), calls, repeat), "beacons/s"),
+            "to_dict" : result(1 / best(lambda: beacon.Beacon(raw).to_dict(), calls, repeat), "beacons/s"),
+            "parse_many" : result(BULK_BEACONS / best(lambda: beacon.parse_many(bulk), 1, repeat), "beacons/s")}
+
+def recording(path, repeat):
+    """Offline decoding throughput of a WAV recording, and the frames in it"""
+    data, samp_rate = offline.load(path, "wav")
+    elapsed = best(lambda: offline.decode_recording(path, "wav"), 1, repeat)
+    frames = offline.decode_recording(path, "wav")
+    return {"samples" : result(len(data) / elapsed, "samples/s"),
+            "realtime" : result(float(len(data)) / samp_rate / elapsed, "x")}, frames
+
+def environment():
+    return {"python" : platform.python_version(), "numpy" : numpy.__version__,
+            "platform" : platform.platform(), "machine" : platform.machine(),
+            "time" : time.time()}
+
+def run(path=None, repeat=REPEAT, scale=1):
+    """Run all benchmarks, returning {"environment": ..., "results": {group: {name: result}}}
+
+    path is a WAV recording with a beacon; without it the recording benchmark
+    is left out. The aausat4_fec benchmark is left out if GNU Radio is not available.
+    """
+    calls = max(int(CALLS * scale), 1)
+    results = {}
+    data = BEACON
+    if path:
+        results["recording"], frames = recording(path, repeat)
+        beacons = [f for f in frames if f["status"] == "ok" and f["frame_type"] == "long"]
+        if not beacons:
+            raise Exception("No long frame in {}".format(path))
+        data = binascii.unhexlify(beacons[0]["data"])
+    # the HMAC is not checked without a key, so any value will do
+    long_frame = fec.PacketHandler().encode(data + b"\x00" * fec.HMAC_LENGTH)
+
+    results["viterbi_long"] = viterbi(long_frame, calls, repeat)
+    results["viterbi_short"] = viterbi(fec.TESTDATA, calls, repeat)
+    results["decode_rs"] = rs(data, calls, repeat)
+    results["packet_handler"] = packet_handler((("long", long_frame), ("short", fec.TESTDATA)),
+                                               data, calls, repeat)
+    try:
+        results["aausat4_fec"] = fec_block(long_frame, calls, repeat)
+    except ImportError:
+        pass
+    results["parser"] = parser(data[4:], calls, repeat)
+    return {"environment" : environment(), "results" : results}
+
+def compare(baseline, current):
+    """List of (group, name, unit, baseline value, current value, ratio) for the results in both"""
+    rows = []
+    for group in sorted(current["results"]):
+        for name in sorted(current["results"][group]):
+            new = current["results"][group][name]
+            old = baseline["results"].get(group, {}).get(name)
+            if old is None or old["unit"] != new["unit"]:
+                continue
+            ratio = new["value"] / old["value"] if old["value"] else float("nan")
+            rows.append((group, name, new["unit"], old["value"], new["value"], ratio))
+    return rows
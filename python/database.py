@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import sqlite3
+import threading
+
+## Telemetry database
+# Decoded subsystems are written to a SQLite database as one row per field,
+# together with the subsystem name, receive time and subsystem boot count.
+# Fields with several components (such as ADCS gyro) are stored as field.0,
+# field.1...
+#
+# Rows are queued and inserted in batches, in a single transaction, when
+# batch_size rows are pending or, from a timer thread, flush_interval seconds
+# after the first row was queued, so that rows are committed even if no more
+# beacons arrive. Beacons come every few seconds, so the interval should be
+# longer than that for batching to have any effect. The database is opened in
+# WAL mode so that it can be queried while a flowgraph is writing.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS telemetry (
+    subsystem TEXT NOT NULL,
+    rx_time REAL NOT NULL,
+    boot_count INTEGER,
+    field TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS telemetry_time ON telemetry (subsystem, rx_time);
+CREATE INDEX IF NOT EXISTS telemetry_boot_count ON telemetry (boot_count);
+"""
+
+INSERT = "INSERT INTO telemetry (subsystem, rx_time, boot_count, field, value) VALUES (?, ?, ?, ?, ?)"
+
+def field_rows(name, subsystem, rx_time):
+    boot_count = getattr(subsystem, "boot_count", None)
+    for field, value in subsystem.to_dict().items():
+        if isinstance(value, tuple):
+            for i, v in enumerate(value):
+                yield (name, rx_time, boot_count, "{}.{}".format(field, i), v)
+        else:
+            yield (name, rx_time, boot_count, field, value)
+
+class Database(object):
+    """SQLite telemetry sink with batched inserts"""
+    def __init__(self, path, batch_size=256, flush_interval=30.0):
+        # the message handler runs in its own thread
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, b, rx_time):
+        """Queue the valid subsystems of beacon b, received at rx_time"""
+        with self.lock:
+            for name, subsystem in b.subsystems.items():
+                self.pending.extend(field_rows(name, subsystem, rx_time))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+            elif self.pending and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            with self.connection:
+                self.connection.executemany(INSERT, self.pending)
+            self.pending = []
+
+    def latest(self, subsystem):
+        """Latest value of each field of subsystem, as {field: value}"""
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT field, value FROM telemetry WHERE subsystem = ? AND rx_time = "
+            "(SELECT MAX(rx_time) FROM telemetry WHERE subsystem = ?)", (subsystem, subsystem))
+        return dict(rows)
+
+    def series(self, subsystem, field, start=None, stop=None):
+        """List of (rx_time, value) of a field with start <= rx_time < stop"""
+        self.flush()
+        query = "SELECT rx_time, value FROM telemetry WHERE subsystem = ? AND field = ?"
+        args = [subsystem, field]
+        if start is not None:
+            query += " AND rx_time >= ?"
+            args.append(start)
+        if stop is not None:
+            query += " AND rx_time < ?"
+            args.append(stop)
+        return self.connection.execute(query + " ORDER BY rx_time", args).fetchall()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
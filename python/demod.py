@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import numpy
+
+## FSK demodulator
+# Vectorized demodulator for the AAUSAT-4 FSK mode, for processing recordings
+# without GNU Radio. Input is either FM demodulated audio (as the example WAV
+# recording) or complex baseband, which is FM demodulated first, as the
+# quadrature demod block in the OZ4CUB flowgraphs does.
+#
+# Each symbol is integrated over samp_per_sym samples. The input is processed
+# in blocks of TIMING_BLOCK symbols, and the symbol timing of each block is the
+# phase with the largest average symbol magnitude. When the phase wraps around
+# between blocks (the transmitter clock is slower or faster than nominal) a
+# duplicate symbol is dropped or the missed symbol is inserted, so that the
+# symbol stream follows the transmitter clock.
+#
+# The demodulator keeps its state between calls to work(), so a recording can
+# be processed in pieces of any size.
+
+TIMING_BLOCK = 64
+
+class Demodulator(object):
+    """FSK demodulator producing soft symbols (positive for 1)"""
+    def __init__(self, samp_per_sym, iq=False):
+        self.samp_per_sym = samp_per_sym
+        self.iq = iq
+        self.block = TIMING_BLOCK * samp_per_sym
+        # demodulated samples not yet used, preceded by a symbol of history
+        self.buffer = numpy.zeros(samp_per_sym, dtype=numpy.float32)
+        # absolute index of the first sample of the next block
+        self.position = 0
+        self.phase = None
+        self.last_sample = None
+
+    def frequency(self, samples):
+        # quadrature demod, carrying over the last sample
+        samples = numpy.asarray(samples, dtype=numpy.complex64)
+        if len(samples) == 0:
+            return numpy.zeros(0, dtype=numpy.float32)
+        previous = samples[0] if self.last_sample is None else self.last_sample
+        delayed = numpy.concatenate(([previous], samples[:-1]))
+        self.last_sample = samples[-1]
+        return numpy.angle(samples * numpy.conj(delayed)).astype(numpy.float32)
+
+    def work(self, samples):
+        """Demodulate samples
+
+        Returns the soft symbols for the complete timing blocks available, and the
+        absolute index of the last sample of each symbol. Remaining samples are kept
+        for the next call.
+        """
+        sps = self.samp_per_sym
+        if self.iq:
+            samples = self.frequency(samples)
+        buf = numpy.concatenate((self.buffer, numpy.asarray(samples, dtype=numpy.float32)))
+
+        # integrate over a symbol: filtered[i] is the sum of buf[i:i+sps]
+        integral = numpy.concatenate(([0], numpy.cumsum(buf, dtype=numpy.float64)))
+        filtered = (integral[sps:] - integral[:-sps]).astype(numpy.float32)
+        nblocks = (len(filtered) - sps) // self.block
+        if nblocks <= 0:
+            self.buffer = buf
+            return numpy.zeros(0, dtype=numpy.float32), numpy.zeros(0, dtype=numpy.int64)
+
+        grid = filtered[sps:sps + nblocks * self.block].reshape(nblocks, TIMING_BLOCK, sps)
+        phase = numpy.argmax(numpy.abs(grid).mean(axis=1), axis=1)
+        previous = numpy.concatenate(([phase[0] if self.phase is None else self.phase], phase[:-1]))
+        jump = phase - previous
+
+        starts = sps + numpy.arange(nblocks) * self.block + phase
+        positions = starts[:,None] + numpy.arange(TIMING_BLOCK) * sps
+        keep = numpy.ones(positions.shape, dtype=bool)
+        # phase wrapped down: the first symbol repeats the last one of the previous block
+        keep[jump < -sps // 2, 0] = False
+        positions = positions[keep]
+        # phase wrapped up: a symbol was skipped before the block
+        inserted = starts[jump > sps // 2] - sps
+        if len(inserted):
+            positions = numpy.sort(numpy.concatenate((positions, inserted)))
+
+        symbols = filtered[positions]
+        indices = self.position - sps + positions + sps - 1
+
+        self.phase = phase[-1]
+        self.position += nblocks * self.block
+        self.buffer = buf[nblocks * self.block:]
+        return symbols, indices.astype(numpy.int64)
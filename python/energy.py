@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import os
+
+import numpy
+
+## Energy index
+# Long recordings are mostly noise. The energy index holds, for each window of
+# WINDOW_SYMBOLS symbols, the power of the (FM demodulated) signal and the ratio
+# between the power after integrating over a symbol and the power before it.
+# The ratio is about 1 for white noise and grows up to samp_per_sym for a clean
+# FSK signal, whose energy is concentrated below the symbol rate. Windows whose
+# ratio stands out from the noise floor of the recording (its median ratio) are
+# active, and only those, plus a margin, need to be demodulated.
+#
+# The index is stored next to the recording, as recording + INDEX_SUFFIX.
+
+INDEX_SUFFIX = ".energy.npz"
+WINDOW_SYMBOLS = 128
+# windows processed at once when building the index
+BLOCK_WINDOWS = 1024
+# ratio over the noise floor for a window to be active
+ACTIVE_FACTOR = 1.5
+# windows with a ratio over this fraction of samp_per_sym are always active, so
+# that recordings which are mostly signal are not taken as noise
+CLEAN_RATIO = 0.6
+# windows added before and after active windows
+MARGIN_WINDOWS = 4
+
+def build_index(data, samp_per_sym, iq=False):
+    """Energy index of a recording of FM demodulated audio, or IQ if iq is True"""
+    window = WINDOW_SYMBOLS * samp_per_sym
+    lowpass = max(samp_per_sym // 2, 1)
+    nwindows = len(data) // window
+    power = numpy.zeros(nwindows, dtype=numpy.float32)
+    ratio = numpy.zeros(nwindows, dtype=numpy.float32)
+    for first in range(0, nwindows, BLOCK_WINDOWS):
+        last = min(first + BLOCK_WINDOWS, nwindows)
+        x = numpy.asarray(data[first*window:last*window]).reshape(last - first, window)
+        if iq:
+            # low-pass to about the signal bandwidth, then quadrature demod;
+            # otherwise wideband noise hides the signal after the FM demod
+            integral = numpy.cumsum(x, axis=1)
+            x = integral[:,lowpass:] - integral[:,:-lowpass]
+            x = numpy.angle(x[:,1:] * numpy.conj(x[:,:-1]))
+        x = x.astype(numpy.float64)
+        integral = numpy.cumsum(x, axis=1)
+        filtered = integral[:,samp_per_sym:] - integral[:,:-samp_per_sym]
+        p = numpy.mean(x**2, axis=1)
+        power[first:last] = 10 * numpy.log10(p + 1e-30)
+        ratio[first:last] = numpy.mean(filtered**2, axis=1) / (samp_per_sym * p + 1e-30)
+    return {"window" : window, "samp_per_sym" : samp_per_sym, "power" : power, "ratio" : ratio}
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+def save_index(path, index):
+    with open(index_path(path), "wb") as f:
+        numpy.savez(f, **index)
+
+def load_index(path, samp_per_sym):
+    """Stored index of a recording, or None if missing or out of date"""
+    ipath = index_path(path)
+    if not os.path.exists(ipath) or os.path.getmtime(ipath) < os.path.getmtime(path):
+        return None
+    stored = numpy.load(ipath)
+    index = dict((k, stored[k]) for k in stored.files)
+    if int(index["samp_per_sym"]) != samp_per_sym:
+        return None
+    index["window"] = int(index["window"])
+    return index
+
+def active_segments(index, length, factor=ACTIVE_FACTOR, margin=MARGIN_WINDOWS):
+    """List of (start, stop) in samples of the active parts of a recording of length samples"""
+    ratio = index["ratio"]
+    window = index["window"]
+    floor = numpy.median(ratio) if len(ratio) else 0
+    active = ratio > min(factor * floor, CLEAN_RATIO * int(index["samp_per_sym"]))
+    # widen by the margin on both sides
+    count = numpy.concatenate(([0], numpy.cumsum(active)))
+    n = numpy.arange(len(active))
+    widened = count[numpy.minimum(n + margin + 1, len(active))] > count[numpy.maximum(n - margin, 0)]
+    # the partial window at the end is not indexed, so it is always decoded
+    widened = numpy.concatenate(([False], widened, [True], [False]))
+    edges = numpy.flatnonzero(numpy.diff(widened.astype(numpy.int8)))
+    return [(start * window, min(stop * window, length)) for start, stop in zip(edges[::2], edges[1::2])
+            if start * window < length]
@@ -24,16 +24,29 @@ import hashlib
 import hmac
 import ctypes
 import codecs
+import random
+import math
+import collections
+import timeit
 
 VITERBI_RATE = 2
 VITERBI_TAIL = 1
 VITERBI_CONSTRAINT = 7
+# most paths list_viterbi can list
+VITERBI_LIST_MAX = 256
+INVERTED_STATE = (1 << (VITERBI_CONSTRAINT - 1)) - 1
 
 BITS_PER_BYTE = 8
 MAX_FEC_LENGTH = 255
 
 RS_LENGTH = 32
 RS_BLOCK_LENGTH = 255
+RS_ERASURE_STEP = 4
+# parity bytes kept for error detection when decoding with erasures: with
+# no_eras erasures RS corrects (RS_LENGTH - no_eras) / 2 errors, and with
+# no margin any input decodes. Smaller margins let wrong codewords through
+# at low SNR for little extra coding gain.
+RS_ERASURE_MARGIN = 16
 
 HMAC_LENGTH = 2
 HMAC_KEY_LENGTH = 16
@@ -44,6 +57,24 @@ CSP_OVERHEAD = 4
 SHORT_FRAME_LIMIT = 25
 LONG_FRAME_LIMIT = 86
 
+# AAUSAT-4 syncword, as used by the correlator in the example flowgraphs,
+# and bits in the packet that follows it
+SYNCWORD = "010011110101101000110100010000110101010101000010"
+PACKET_BITS = 2008
+
+# frame types, tried in order: name, FEC bytes in the packet, description
+FRAMES = (("long", slice(1, None), "250 FEC bytes, 92 data bytes"),
+          ("short", slice(1, 1 + 128), "128 FEC bytes, 31 data bytes"))
+
+# default path metric gate calibration: random frames per length, and how
+# many standard deviations below the noise mean a frame must fall to be kept
+GATE_CALIBRATION_FRAMES = 32
+GATE_SIGMAS = 4
+
+# stages timed by the instrumentation, and operations timed and counted
+STAGES = ("viterbi", "randomizer", "rs", "hmac")
+OPERATIONS = ("decode", "encode")
+
 bbfec = ctypes.CDLL("libbbfec.so")
 
 # viterbi
@@ -53,12 +84,30 @@ bbfec.create_viterbi.restype = ctypes.c_void_p
 bbfec.init_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_int]
 bbfec.init_viterbi.restype = ctypes.c_int
 
+bbfec.init_viterbi_dual.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+bbfec.init_viterbi_dual.restype = ctypes.c_int
+
+bbfec.metric_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+bbfec.metric_viterbi.restype = ctypes.c_int
+
+bbfec.constrain_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint]
+bbfec.constrain_viterbi.restype = ctypes.c_int
+
 bbfec.update_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint16]
 bbfec.update_viterbi.restype = ctypes.c_int
 
 bbfec.chainback_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint]
 bbfec.chainback_viterbi.restype = ctypes.c_int
 
+bbfec.update_viterbi_soft.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint16]
+bbfec.update_viterbi_soft.restype = ctypes.c_int
+
+bbfec.list_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_int), ctypes.c_uint, ctypes.c_uint, ctypes.c_int]
+bbfec.list_viterbi.restype = ctypes.c_int
+
+bbfec.sova_viterbi.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint]
+bbfec.sova_viterbi.restype = ctypes.c_int
+
 bbfec.delete_viterbi.argtypes = [ctypes.c_void_p]
 bbfec.delete_viterbi.restype = None
 
@@ -69,7 +118,7 @@ bbfec.encode_viterbi.restype = None
 bbfec.encode_rs.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
 bbfec.encode_rs.restype = None
 
-bbfec.decode_rs.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_int]
+bbfec.decode_rs.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_int), ctypes.c_int, ctypes.c_int]
 bbfec.decode_rs.restype = ctypes.c_int
 
 # randomizer
@@ -83,21 +132,82 @@ TESTDATA = codecs.decode("8c1a48c0043fab4d3e790e2274af0a479c013770a2f889df13fefd
 
 
 class PacketHandler():
-    def __init__(self, key=None, viterbi=True, rs=True, randomize=True):
+    def __init__(self, key=None, viterbi=True, rs=True, randomize=True, list_size=1, erasures=False,
+                 iterations=0, csp_header=None, either_polarity=False, gate=False,
+                 gate_sigmas=GATE_SIGMAS, gate_frames=GATE_CALIBRATION_FRAMES, instrument=False):
         self.ccsds_sequence = ctypes.create_string_buffer(MAX_FEC_LENGTH)
 
         bbfec.ccsds_generate_sequence(self.ccsds_sequence, MAX_FEC_LENGTH)
 
         self.vp = bbfec.create_viterbi(MAX_FEC_LENGTH * BITS_PER_BYTE)
 
+        if not 1 <= list_size <= VITERBI_LIST_MAX:
+            raise Exception("List size must be between 1 and {}".format(VITERBI_LIST_MAX))
+
         self.key = hashlib.sha1(codecs.encode(key, "ascii")).digest()[:HMAC_KEY_LENGTH] if key else None
         self.viterbi = viterbi
         self.rs = rs
         self.randomize = randomize
+        self.list_size = list_size
+        self.erasures = erasures
+        self.iterations = iterations
+        self.csp_header = csp_header
+        self.either_polarity = either_polarity
+        self.inverted = False
+        self.gate = gate
+        self.gate_sigmas = gate_sigmas
+        self.gate_frames = gate_frames
+        self.gate_thresholds = {}
+        self.noise = False
+        self.path_metric = 0
+        # counter of the last decode failure, for the instrumentation
+        self.failure = None
+        # whether the last decode already checked the HMAC (list decoding)
+        self.authenticated = False
+        self.ones = ctypes.create_string_buffer(b"\xff" * MAX_FEC_LENGTH, MAX_FEC_LENGTH)
+        self.instrument = instrument
+        self.reset_stats()
 
     def __del__(self):
         bbfec.delete_viterbi(self.vp)
 
+    def reset_stats(self):
+        self.times = dict.fromkeys(STAGES + OPERATIONS, 0.0)
+        self.calls = dict.fromkeys(OPERATIONS, 0)
+        self.counters = dict.fromkeys(("decoded", "rs_failures", "viterbi_failures", "hmac_failures"), 0)
+        self.bit_corrections = collections.Counter()
+        self.byte_corrections = collections.Counter()
+        self.gate_accepted = 0
+        self.gate_rejected = 0
+
+    def stats(self, reset=False):
+        # Snapshot of the instrumentation: seconds spent in each stage and
+        # operation, calls to each operation, outcome counters and histograms
+        # of the corrections done in successful decodes. A lost frame counts
+        # as an RS failure, as a Viterbi failure when the iterative or list
+        # decoder ran out of passes or paths, or as an HMAC failure when it
+        # only failed authentication.
+        counters = dict(self.counters, gate_accepted=self.gate_accepted, gate_rejected=self.gate_rejected)
+        snapshot = {"times" : dict(self.times), "calls" : dict(self.calls), "counters" : counters,
+                    "bit_corrections" : dict(self.bit_corrections),
+                    "byte_corrections" : dict(self.byte_corrections)}
+        if reset:
+            self.reset_stats()
+        return snapshot
+
+    def timed(self, name, function, *args):
+        # Call function, adding its run time to a stage or operation when
+        # instrumented. Operations are also counted.
+        if not self.instrument:
+            return function(*args)
+        start = timeit.default_timer()
+        try:
+            return function(*args)
+        finally:
+            self.times[name] += timeit.default_timer() - start
+            if name in self.calls:
+                self.calls[name] += 1
+
     def hexdump(self, src, length=16):
         filt = "".join([(len(repr(chr(x))) == 3) and chr(x) or "." for x in range(256)])
         offset = 0
@@ -130,58 +240,336 @@ class PacketHandler():
 
         return data[:CSP_OVERHEAD + size]
 
+    def rx_buffer(self, data):
+        # Mutable copy of the received symbols. data can be any object
+        # exporting a buffer, such as a numpy view into a PDU.
+        return (ctypes.c_char * len(data)).from_buffer_copy(data)
+
     def decode(self, data):
+        if not self.instrument:
+            return self.decode_symbols(data)
+        self.failure = None
+        try:
+            data, bit_corr, byte_corr = self.timed("decode", self.decode_symbols, data)
+        except Exception:
+            if self.failure and not self.noise:
+                self.counters[self.failure] += 1
+            raise
+        self.counters["decoded"] += 1
+        self.bit_corrections[bit_corr] += 1
+        self.byte_corrections[byte_corr] += 1
+        return data, bit_corr, byte_corr
+
+    def decode_symbols(self, data):
+        self.authenticated = False
         rx_length = int(len(data))
-        data_mutable = ctypes.create_string_buffer(data)
-        bit_corr = 0
-        byte_corr = 0
+        data_mutable = self.rx_buffer(data)
 
         if self.viterbi:
             rx_length = (rx_length / VITERBI_RATE) - VITERBI_TAIL
-            bbfec.init_viterbi(self.vp, 0)
-            bbfec.update_viterbi(self.vp, data_mutable, int((rx_length * BITS_PER_BYTE) + (VITERBI_CONSTRAINT - 1)))
-            bit_corr = bbfec.chainback_viterbi(self.vp, data_mutable, int(rx_length * BITS_PER_BYTE), int(0))
+            if self.iterations:
+                return self.decode_iterative(data, rx_length)
+            return self.decode_viterbi(data_mutable, rx_length)
+
+        data, byte_corr = self.decode_block(data_mutable, rx_length)
+        return data, 0, byte_corr
+
+    def viterbi_forward(self, data_mutable, rx_length, known=None, soft=False):
+        # Both code polynomials have odd weight, so inverted symbols are the
+        # codeword of the inverted data, starting and ending in the all-ones
+        # state. Starting from both states lets one pass decode either
+        # polarity. The end states to chain back from are returned best
+        # first, as the tail alone is not always enough to tell them apart.
+        dual = self.either_polarity and not known
+        gate = self.gate and not known
+        if gate:
+            # calibration needs the decoder, so it must happen before update
+            threshold = self.gate_threshold(rx_length)
+
+        if dual:
+            bbfec.init_viterbi_dual(self.vp, 0, INVERTED_STATE)
+        else:
+            bbfec.init_viterbi(self.vp, INVERTED_STATE if self.inverted else 0)
+        if known:
+            mask, bits = known
+            if self.inverted:
+                bits = ctypes.create_string_buffer(bits.raw, rx_length)
+                bbfec.ccsds_xor_sequence(bits, self.ones, int(rx_length))
+            bbfec.constrain_viterbi(self.vp, mask, bits, int(rx_length * BITS_PER_BYTE))
+
+        update = bbfec.update_viterbi_soft if soft else bbfec.update_viterbi
+        self.timed("viterbi", update, self.vp, data_mutable, int((rx_length * BITS_PER_BYTE) + (VITERBI_CONSTRAINT - 1)))
+
+        if dual:
+            endstates = sorted([0, INVERTED_STATE], key=lambda state: bbfec.metric_viterbi(self.vp, state))
+        else:
+            endstates = [INVERTED_STATE if self.inverted else 0]
+
+        self.path_metric = bbfec.metric_viterbi(self.vp, endstates[0])
+
+        if gate:
+            self.noise = self.path_metric > threshold
+            if self.noise:
+                self.gate_rejected += 1
+                raise Exception("Path metric too high, frame rejected as noise")
+            self.gate_accepted += 1
+
+        return endstates
+
+    def gate_threshold(self, rx_length):
+        # The best path for random symbols is almost always at the same
+        # distance from them, so the gate is calibrated for each frame length
+        # by decoding random frames. The metric is taken at the end states
+        # that decoding uses: the best of both polarities, or the single
+        # polarity the handler is set to.
+        states = [0, INVERTED_STATE] if self.either_polarity else [INVERTED_STATE if self.inverted else 0]
+        key = (rx_length, tuple(states))
+        if key not in self.gate_thresholds:
+            rng = random.Random(rx_length)
+            metrics = []
+            for i in range(self.gate_frames):
+                noise = ctypes.create_string_buffer(bytes(bytearray(rng.getrandbits(8) for j in range(VITERBI_RATE * (rx_length + VITERBI_TAIL)))))
+                if self.either_polarity:
+                    bbfec.init_viterbi_dual(self.vp, 0, INVERTED_STATE)
+                else:
+                    bbfec.init_viterbi(self.vp, states[0])
+                bbfec.update_viterbi(self.vp, noise, int((rx_length * BITS_PER_BYTE) + (VITERBI_CONSTRAINT - 1)))
+                metrics.append(min(bbfec.metric_viterbi(self.vp, state) for state in states))
+            mean = float(sum(metrics)) / len(metrics)
+            std = math.sqrt(sum((m - mean) ** 2 for m in metrics) / len(metrics))
+            self.gate_thresholds[key] = mean - self.gate_sigmas * std
+
+        return self.gate_thresholds[key]
+
+    def decode_viterbi(self, data_mutable, rx_length, known=None):
+        if self.list_size > 1:
+            return self.decode_list(data_mutable, rx_length, known)
+
+        endstates = self.viterbi_forward(data_mutable, rx_length, known, self.erasures)
+        best = None
+        for endstate in endstates:
+            self.inverted = endstate == INVERTED_STATE
+            reliability = self.byte_reliability(rx_length, endstate) if self.erasures else None
+            bit_corr = self.timed("viterbi", bbfec.chainback_viterbi, self.vp, data_mutable, int(rx_length * BITS_PER_BYTE), endstate)
+            if self.inverted:
+                bbfec.ccsds_xor_sequence(data_mutable, self.ones, int(rx_length))
+            try:
+                data, byte_corr = self.decode_block(data_mutable, rx_length, reliability)
+            except Exception:
+                if best is None:
+                    best = data_mutable.raw
+                if endstate == endstates[-1]:
+                    # leave the most likely polarity and its output for
+                    # the constrained passes of decode_iterative
+                    self.inverted = endstates[0] == INVERTED_STATE
+                    ctypes.memmove(data_mutable, best, len(best))
+                    raise
+                continue
+            return data, bit_corr, byte_corr
+
+    def decode_iterative(self, data, rx_length):
+        # When RS fails, run Viterbi again with bits of the frame pinned, for
+        # at most self.iterations extra passes. Every constrained pass pins
+        # the bits that follow from the frame structure. As a heuristic, a
+        # pass may also pin the size decoded by the last pass that did not
+        # pin it, and with it the zero padding. That size comes from a failed
+        # pass and may be wrong, so it is only tried once: a pass pinning a
+        # size is followed by one pinning the structure alone.
+        known = None
+        size = None
+        tried = set()
+
+        for iteration in range(self.iterations + 1):
+            data_mutable = self.rx_buffer(data)
+            try:
+                return self.decode_viterbi(data_mutable, rx_length, known)
+            except Exception:
+                if self.noise:
+                    raise
+
+            # After a failed hard decision pass the buffer holds the
+            # derandomized Viterbi output
+            if size is None and self.list_size == 1:
+                size = bytearray(data_mutable.raw)[1]
+                if size in tried or not self.size_in_range(size, rx_length):
+                    size = None
+            else:
+                size = None
+            if size is not None:
+                tried.add(size)
+            mask, bits = self.frame_constraints(rx_length, size)
+            if known and (mask, bits) == (known[0].raw, known[1].raw):
+                break
+            known = (ctypes.create_string_buffer(mask, rx_length),
+                     ctypes.create_string_buffer(bits, rx_length))
+
+        if self.failure != "hmac_failures":
+            self.failure = "viterbi_failures"
+        raise Exception("Iterative decoding error")
+
+    def data_length(self, rx_length):
+        return rx_length - RS_LENGTH if self.rs else rx_length
+
+    def size_in_range(self, size, rx_length):
+        return SIZE_LENGTH + CSP_OVERHEAD + size <= self.data_length(rx_length)
+
+    def frame_constraints(self, rx_length, size=None):
+        # Bits pinned in a constrained pass, as seen by the Viterbi decoder.
+        # From the frame structure: the size field MSB (frames are at most
+        # 255 bytes), the high bits of the size LSB that are zero for every
+        # size that fits in the frame, and the CSP header if given. If size
+        # is given, the size field and the zero padding after the data.
+        mask = bytearray(rx_length)
+        bits = bytearray(rx_length)
+        data_length = self.data_length(rx_length)
+
+        mask[0] = 0xff
+        max_size = max(data_length - SIZE_LENGTH - CSP_OVERHEAD, 0)
+        mask[1] = (0xff << max_size.bit_length()) & 0xff
+        if self.csp_header:
+            mask[SIZE_LENGTH:SIZE_LENGTH + CSP_OVERHEAD] = b"\xff" * CSP_OVERHEAD
+            bits[SIZE_LENGTH:SIZE_LENGTH + CSP_OVERHEAD] = self.csp_header
+        if size is not None:
+            end = SIZE_LENGTH + CSP_OVERHEAD + size
+            mask[1] = 0xff
+            bits[1] = size
+            mask[end:data_length] = b"\xff" * (data_length - end)
 
         if self.randomize:
-            bbfec.ccsds_xor_sequence(data_mutable, self.ccsds_sequence, int(rx_length))
+            sequence = bytearray(self.ccsds_sequence.raw)
+            bits = bytearray(b ^ s for b, s in zip(bits, sequence))
+
+        return bytes(mask), bytes(bits)
+
+    def byte_reliability(self, rx_length, endstate):
+        # SOVA reliability of each decoded byte, taken as that of its
+        # least reliable bit
+        nbits = int(rx_length * BITS_PER_BYTE)
+        reliability = ctypes.create_string_buffer(nbits)
+        self.timed("viterbi", bbfec.sova_viterbi, self.vp, reliability, nbits, endstate)
+        reliability = bytearray(reliability.raw)
+        return [min(reliability[i:i + BITS_PER_BYTE]) for i in range(0, nbits, BITS_PER_BYTE)]
+
+    def decode_list(self, data_mutable, rx_length, known=None):
+        # Try the list_size most likely Viterbi paths in order, and keep the
+        # first one that passes RS (and HMAC, if we have a key)
+        paths = ctypes.create_string_buffer(self.list_size * rx_length)
+        metrics = (ctypes.c_int * self.list_size)()
+
+        endstates = self.viterbi_forward(data_mutable, rx_length, known, True)
+        authenticated = True
+        for endstate in endstates:
+            self.inverted = endstate == INVERTED_STATE
+            count = self.timed("viterbi", bbfec.list_viterbi, self.vp, paths, metrics, int(rx_length * BITS_PER_BYTE), endstate, self.list_size)
+            reliability = self.byte_reliability(rx_length, endstate) if self.erasures else None
+
+            for i in range(count):
+                path = ctypes.create_string_buffer(paths[i * rx_length:(i + 1) * rx_length], rx_length)
+                if self.inverted:
+                    bbfec.ccsds_xor_sequence(path, self.ones, int(rx_length))
+                try:
+                    data, byte_corr = self.decode_block(path, rx_length, reliability)
+                except Exception:
+                    continue
+                if self.key:
+                    try:
+                        self.timed("hmac", self.hmac_verify, data)
+                    except Exception:
+                        authenticated = False
+                        continue
+                    self.authenticated = True
+                return data, metrics[i], byte_corr
+
+        self.inverted = endstates[0] == INVERTED_STATE
+        self.failure = "viterbi_failures" if authenticated else "hmac_failures"
+        raise Exception("List Viterbi decoding error")
+
+    def decode_block(self, data_mutable, rx_length, reliability=None):
+        byte_corr = 0
+
+        if self.randomize:
+            self.timed("randomizer", bbfec.ccsds_xor_sequence, data_mutable, self.ccsds_sequence, int(rx_length))
 
         if self.rs:
             pad = RS_BLOCK_LENGTH - RS_LENGTH - (rx_length - RS_LENGTH)
-            byte_corr = bbfec.decode_rs(data_mutable, None, 0, int(pad))
+            received = data_mutable.raw
+            byte_corr = self.timed("rs", bbfec.decode_rs, data_mutable, None, 0, int(pad))
+            if byte_corr == -1 and reliability:
+                byte_corr = self.timed("rs", self.decode_rs_erasures, data_mutable, received, pad, reliability)
             rx_length = rx_length - RS_LENGTH
             if byte_corr == -1:
+                self.failure = "rs_failures"
                 raise Exception("Reed-Solomon decoding error")
 
         size = struct.unpack(">H", data_mutable[:SIZE_LENGTH])[0]
+        if SIZE_LENGTH + CSP_OVERHEAD + size > rx_length:
+            self.failure = "rs_failures"
+            raise Exception("Frame size out of range")
+
+        return data_mutable[SIZE_LENGTH:SIZE_LENGTH + CSP_OVERHEAD + size], byte_corr
+
+    def decode_rs_erasures(self, data_mutable, received, pad, reliability):
+        # Retry RS marking more and more of the least reliable bytes as
+        # erasures, keeping RS_ERASURE_MARGIN parity bytes for detection.
+        # A result is rejected if all its corrections are erased bytes, as
+        # then nothing outside the erasures confirms the codeword.
+        order = sorted(range(len(reliability)), key=lambda i: reliability[i])
+        eras_pos = (ctypes.c_int * RS_LENGTH)()
+
+        for no_eras in range(RS_ERASURE_STEP, RS_LENGTH - RS_ERASURE_MARGIN + 1, RS_ERASURE_STEP):
+            for i in range(no_eras):
+                eras_pos[i] = pad + order[i]
+            ctypes.memmove(data_mutable, received, len(received))
+            byte_corr = bbfec.decode_rs(data_mutable, eras_pos, no_eras, int(pad))
+            if byte_corr == -1:
+                continue
+            corrected = set(i for i, (a, b) in enumerate(zip(data_mutable.raw, received)) if a != b)
+            if corrected <= set(order[:no_eras]):
+                continue
+            return byte_corr
 
-        return data_mutable[SIZE_LENGTH:SIZE_LENGTH + CSP_OVERHEAD + size], bit_corr, byte_corr
+        ctypes.memmove(data_mutable, received, len(received))
+
+        return -1
 
     def encode(self, data):
+        return self.timed("encode", self.encode_data, data)
+
+    def encode_data(self, data):
         tx_length = self.tx_frame_length(len(data))
         data = struct.pack(">H", len(data) - CSP_OVERHEAD) + data
         data_mutable = ctypes.create_string_buffer(data, MAX_FEC_LENGTH)
 
         if self.rs:
             pad = RS_BLOCK_LENGTH - RS_LENGTH - tx_length
-            bbfec.encode_rs(data_mutable, ctypes.cast(ctypes.byref(data_mutable, tx_length), ctypes.POINTER(ctypes.c_char)), pad)
+            self.timed("rs", bbfec.encode_rs, data_mutable, ctypes.cast(ctypes.byref(data_mutable, tx_length), ctypes.POINTER(ctypes.c_char)), pad)
             tx_length += RS_LENGTH
 
         if self.randomize:
-            bbfec.ccsds_xor_sequence(data_mutable, self.ccsds_sequence, tx_length)
+            self.timed("randomizer", bbfec.ccsds_xor_sequence, data_mutable, self.ccsds_sequence, tx_length)
 
         if self.viterbi:
-            bbfec.encode_viterbi(data_mutable, data_mutable, tx_length * BITS_PER_BYTE)
+            self.timed("viterbi", bbfec.encode_viterbi, data_mutable, data_mutable, tx_length * BITS_PER_BYTE)
             tx_length = (tx_length + VITERBI_TAIL) * VITERBI_RATE
 
         return data_mutable[0:tx_length]
 
     def deframe(self, data):
         data, bit_corr, byte_corr = self.decode(data)
-        data = self.hmac_verify(data) if self.key else data
+        if self.key and self.authenticated:
+            # list decoding already checked the HMAC
+            data = data[:-HMAC_LENGTH]
+        elif self.key:
+            try:
+                data = self.timed("hmac", self.hmac_verify, data)
+            except Exception:
+                if self.instrument:
+                    self.counters["hmac_failures"] += 1
+                raise
         return data, bit_corr, byte_corr
 
     def frame(self, data):
-        data = self.hmac_append(data) if self.key else data
+        data = self.timed("hmac", self.hmac_append, data) if self.key else data
         data = self.encode(data)
         return data
 
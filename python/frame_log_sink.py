@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr
+import pmt
+
+import time
+
+import framelog
+
+class frame_log_sink(gr.basic_block):
+    """
+    Writes the PDUs it receives to a frame log. PDUs with a frame_type (the output
+    of aausat4_fec) are logged as decoded frames, and other PDUs as raw packets.
+    """
+    def __init__(self, path, station=0):
+        gr.basic_block.__init__(self,
+            name="frame_log_sink",
+            in_sig=[],
+            out_sig=[])
+
+        self.writer = framelog.Writer(path, station)
+        self.message_port_register_in(pmt.intern('in'))
+        self.set_msg_handler(pmt.intern('in'), self.handle_msg)
+
+    def handle_msg(self, msg_pmt):
+        msg = pmt.cdr(msg_pmt)
+        if not pmt.is_u8vector(msg):
+            print "[ERROR] Received invalid message type. Expected u8vector"
+            return
+
+        meta = pmt.car(msg_pmt)
+        if not pmt.is_dict(meta):
+            meta = pmt.make_dict()
+        rx_time = pmt.to_python(pmt.dict_ref(meta, pmt.intern('rx_time'), pmt.from_double(time.time())))
+        kind = framelog.FRAME if pmt.dict_has_key(meta, pmt.intern('frame_type')) else framelog.RAW
+
+        self.writer.write(pmt.u8vector_elements(msg), rx_time, kind)
+
+    def stop(self):
+        self.writer.close()
+        return True
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr
+import pmt
+
+import threading
+import time
+
+import framelog
+
+class frame_log_source(gr.basic_block):
+    """
+    Replays the PDUs in a frame log, with their receive time and station in the
+    metadata. speed is relative to real time (1 replays in real time, 10 ten times
+    faster); 0 replays as fast as possible. Only records with start <= rx_time < stop
+    are replayed (start and stop of 0 mean the start and end of the log). When
+    the replay reaches the end, the block reports itself done, so that a
+    flowgraph fed only by it finishes, and sets the done event.
+    """
+    def __init__(self, path, speed=1.0, start=0, stop=0):
+        gr.basic_block.__init__(self,
+            name="frame_log_source",
+            in_sig=[],
+            out_sig=[])
+
+        self.reader = framelog.Reader(path)
+        self.speed = speed
+        self.range = (start or None, stop or None)
+        self.finished = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+        self.message_port_register_out(pmt.intern('out'))
+
+    def start(self):
+        self.finished.clear()
+        self.done.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.finished.set()
+        if self.thread:
+            self.thread.join()
+        return True
+
+    def run(self):
+        first = None
+        for record in self.reader.records(*self.range):
+            if self.finished.is_set():
+                return
+            if self.speed > 0:
+                # keep the spacing between records, scaled by speed
+                if first is None:
+                    first = (record.rx_time, time.time())
+                delay = first[1] + (record.rx_time - first[0]) / self.speed - time.time()
+                if delay > 0 and self.finished.wait(delay):
+                    return
+
+            meta = pmt.make_dict()
+            meta = pmt.dict_add(meta, pmt.intern('rx_time'), pmt.from_double(record.rx_time))
+            meta = pmt.dict_add(meta, pmt.intern('station'), pmt.from_long(record.station))
+            self.message_port_pub(pmt.intern('out'),
+                                  pmt.cons(meta,
+                                           pmt.init_u8vector(len(record.data), bytearray(record.data))))
+
+        # end of the log
+        self.done.set()
+        self.to_basic_block()._post(pmt.intern('system'), pmt.cons(pmt.intern('done'), pmt.from_long(1)))
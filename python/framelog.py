@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import collections
+import os
+import struct
+import threading
+
+import numpy
+
+## Frame log
+# Compact append-only log of PDUs, either as received by aausat4_fec (raw) or as
+# output by it (decoded frames). The log starts with MAGIC, followed by records
+# made of a little-endian header (receive time, station ID, kind, data length)
+# and the PDU data.
+#
+# A sidecar index (log.idx) holds the receive time and file offset of every record,
+# so that readers find a time range by binary search on the memory-mapped index.
+# Records are flushed to the log before their index entry is written, and both
+# files are synced to disk sync_interval seconds after a write, from a timer
+# thread, and on close. Index entries found pointing past the end of the log
+# are dropped when the index is read.
+# Seeking by time assumes records are in receive time order, as written by a single
+# flowgraph. If the index is missing or behind the log (for instance after a crash)
+# the missing entries are rebuilt by scanning the log.
+
+MAGIC = b"AAULOG01"
+RECORD_HEADER = struct.Struct("<dHBH")
+INDEX_DTYPE = numpy.dtype([("rx_time", "<f8"), ("offset", "<u8")])
+INDEX_SUFFIX = ".idx"
+SYNC_INTERVAL = 5.0
+
+# record kinds
+RAW = 0
+FRAME = 1
+
+Record = collections.namedtuple("Record", ("rx_time", "station", "kind", "data"))
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+def scan(f, offset):
+    # index entries for the complete records from offset to the end of the log
+    entries = []
+    f.seek(offset)
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            break
+        rx_time, station, kind, length = RECORD_HEADER.unpack(header)
+        if len(f.read(length)) < length:
+            break
+        entries.append((rx_time, offset))
+        offset += RECORD_HEADER.size + length
+    return numpy.array(entries, dtype=INDEX_DTYPE), offset
+
+def read_index(path):
+    """Index of the log at path, completed by scanning the log if needed"""
+    idx = numpy.zeros(0, dtype=INDEX_DTYPE)
+    if os.path.exists(index_path(path)):
+        size = os.path.getsize(index_path(path)) // INDEX_DTYPE.itemsize
+        if size:
+            idx = numpy.memmap(index_path(path), dtype=INDEX_DTYPE, mode="r", shape=(size,))
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise Exception("{} is not a frame log".format(path))
+        # drop entries for records that did not fully reach the log
+        size = os.fstat(f.fileno()).st_size
+        idx = idx[:numpy.searchsorted(idx["offset"], size - RECORD_HEADER.size, side="right")]
+        offset = len(MAGIC)
+        while len(idx):
+            f.seek(idx["offset"][-1])
+            rx_time, station, kind, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+            offset = int(idx["offset"][-1]) + RECORD_HEADER.size + length
+            if offset <= size:
+                break
+            idx = idx[:-1]
+            offset = len(MAGIC)
+        missing, end = scan(f, offset)
+    if len(missing):
+        idx = numpy.concatenate((idx, missing))
+    return idx, end
+
+class Writer(object):
+    """Appends PDUs to the frame log at path, received by station"""
+    def __init__(self, path, station=0, sync_interval=SYNC_INTERVAL):
+        self.station = station
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.timer = None
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+            open(index_path(path), "wb").close()
+        idx, end = read_index(path)
+        idx = numpy.array(idx)
+        # drop a partial record left at the end, and bring the index up to date
+        with open(path, "r+b") as f:
+            f.truncate(end)
+        with open(index_path(path), "wb") as f:
+            f.write(idx.tobytes())
+        self.log = open(path, "ab")
+        self.index = open(index_path(path), "ab")
+        self.offset = end
+
+    def write(self, data, rx_time, kind=RAW):
+        data = bytes(bytearray(data))
+        with self.lock:
+            self.log.write(RECORD_HEADER.pack(rx_time, self.station, kind, len(data)) + data)
+            # the record must reach the log before an index entry can point to it
+            self.log.flush()
+            self.index.write(numpy.array([(rx_time, self.offset)], dtype=INDEX_DTYPE).tobytes())
+            self.index.flush()
+            self.offset += RECORD_HEADER.size + len(data)
+            if self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self.log.flush()
+            self.index.flush()
+
+    def sync(self):
+        """Sync the log and then the index to disk"""
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.log.closed:
+            os.fsync(self.log.fileno())
+            os.fsync(self.index.fileno())
+
+    def close(self):
+        with self.lock:
+            self.log.flush()
+            self.index.flush()
+            self._sync()
+            self.log.close()
+            self.index.close()
+
+class Reader(object):
+    """Reads the frame log at path"""
+    def __init__(self, path):
+        self.path = path
+        self.index, self.end = read_index(path)
+
+    def __len__(self):
+        return len(self.index)
+
+    def find(self, rx_time):
+        """Number of the first record received at or after rx_time"""
+        return int(numpy.searchsorted(self.index["rx_time"], rx_time))
+
+    def records(self, start=None, stop=None):
+        """Iterate over the records with start <= rx_time < stop"""
+        first = self.find(start) if start is not None else 0
+        last = self.find(stop) if stop is not None else len(self)
+        if first >= last:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.index["offset"][first])
+            for i in range(first, last):
+                rx_time, station, kind, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                yield Record(rx_time, station, kind, f.read(length))
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import binascii
+import struct
+
+import numpy
+
+import annotations
+import beacon
+import demod
+import energy
+import fec
+import sync
+
+## Offline decoding
+# Decodes recordings without a flowgraph. A recording is memory-mapped and cut
+# in chunks which overlap by a packet, so that every packet is complete in the
+# chunk where its syncword starts. Each chunk is demodulated, searched for the
+# syncword and decoded independently, so chunks can be spread across processes.
+#
+# Recordings can be WAV files with FM demodulated audio (as examples/aausat-4.wav),
+# complex64 baseband, float32 soft symbols or unpacked bits (one bit per byte, as
+# written by a file sink after the binary slicer).
+
+FORMATS = ("wav", "iq", "symbols", "bits")
+
+SYMBOLS_PER_CHUNK = 1 << 16
+# maximum bit errors in the syncword, as in the example flowgraphs
+SYNC_THRESHOLD = 8
+
+SYNCWORD = numpy.array([int(b) for b in fec.SYNCWORD], dtype=numpy.uint8)
+FRAME_BITS = len(SYNCWORD) + fec.PACKET_BITS
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xfffe
+
+def guess_format(path):
+    if path.lower().endswith(".wav"):
+        return "wav"
+    if path.lower().endswith((".cf32", ".c64", ".iq")):
+        return "iq"
+    if path.lower().endswith((".f32", ".float", ".sym")):
+        return "symbols"
+    return "bits"
+
+def wav_header(path):
+    """Layout of a WAV file: (data offset, sample dtype, channels, frames, sample rate)"""
+    with open(path, "rb") as f:
+        riff, size, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise Exception("{} is not a WAV file".format(path))
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise Exception("No data in WAV file {}".format(path))
+            chunk, size = struct.unpack("<4sI", header)
+            if chunk == b"fmt ":
+                fmt = f.read(size)
+                size = 0
+            elif chunk == b"data":
+                offset = f.tell()
+                break
+            f.seek(size + (size & 1), 1)
+    if fmt is None:
+        raise Exception("No format in WAV file {}".format(path))
+
+    tag, channels, samp_rate, _, _, bits = struct.unpack_from("<HHIIHH", fmt)
+    if tag == WAVE_FORMAT_EXTENSIBLE:
+        tag, = struct.unpack_from("<H", fmt, 24)
+    if (tag, bits) == (WAVE_FORMAT_PCM, 16):
+        dtype = "<i2"
+    elif (tag, bits) == (WAVE_FORMAT_IEEE_FLOAT, 32):
+        dtype = "<f4"
+    else:
+        raise Exception("Unsupported WAV format {} with {} bits".format(tag, bits))
+
+    frames = size // (channels * numpy.dtype(dtype).itemsize)
+    return offset, dtype, channels, frames, samp_rate
+
+def read_wav(path):
+    """Memory-map the first channel of a WAV file: (samples, sample rate)"""
+    offset, dtype, channels, frames, samp_rate = wav_header(path)
+    samples = numpy.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames, channels))
+    return samples[:,0], samp_rate
+
+def load(path, fmt):
+    """Memory-map a recording: (data, sample rate if known)"""
+    if fmt == "wav":
+        return read_wav(path)
+    dtypes = {"iq" : numpy.complex64, "symbols" : numpy.float32, "bits" : numpy.uint8}
+    return numpy.memmap(path, dtype=dtypes[fmt], mode="r"), None
+
+def decode_packet(ec, packet):
+    # try frame types in order, as aausat4_fec does
+    for frame_type, frame, description in fec.FRAMES:
+        try:
+            data, bit_corr, byte_corr = ec.decode(packet[frame].tobytes())
+            return frame_type, data[:-fec.HMAC_LENGTH], bit_corr, byte_corr
+        except Exception:
+            pass
+    return None
+
+def decode_chunk(path, fmt, samp_per_sym, start, stop, end):
+    """Decode the frames whose syncword starts between start and stop
+
+    Positions and lengths are in samples (WAV and IQ) or symbols. Data up to end
+    is used, so that the last frames are complete. Frames that fail FEC decoding
+    are included with status "fec_failed".
+    """
+    data, samp_rate = load(path, fmt)
+    data = data[start:end]
+    unit = samp_per_sym if fmt in ("wav", "iq") else 1
+    if fmt in ("wav", "iq"):
+        soft, positions = demod.Demodulator(samp_per_sym, iq=(fmt == "iq")).work(data)
+        # first sample of each symbol
+        positions = positions - (samp_per_sym - 1)
+        bits = (soft > 0).astype(numpy.uint8)
+    elif fmt == "symbols":
+        bits = (numpy.asarray(data) > 0).astype(numpy.uint8)
+        positions = numpy.arange(len(bits))
+    else:
+        bits = numpy.asarray(data) & 1
+        positions = numpy.arange(len(bits))
+
+    offsets, distances = sync.find_syncwords(bits, threshold=SYNC_THRESHOLD)
+    keep = start + positions[offsets] < stop
+    offsets, distances = offsets[keep], distances[keep]
+    packets = sync.extract_packets(bits, offsets)
+
+    ec = fec.PacketHandler()
+    frames = []
+    for offset, distance, packet in zip(offsets, distances, packets):
+        frame = {"position" : int(start + positions[offset]), "sync_errors" : int(distance),
+                 "length" : int(positions[offset + FRAME_BITS - 1] - positions[offset] + unit)}
+        decoded = decode_packet(ec, packet)
+        if decoded is None:
+            frame["status"] = "fec_failed"
+            frames.append(frame)
+            continue
+        frame_type, packet, bit_corr, byte_corr = decoded
+        frame.update({"status" : "ok", "frame_type" : frame_type, "bit_corrections" : bit_corr,
+                      "byte_corrections" : byte_corr, "data" : binascii.hexlify(packet).decode()})
+        try:
+            frame["beacon"] = beacon.Beacon(packet[4:]).to_dict()
+        except ValueError:
+            pass
+        frames.append(frame)
+    return frames
+
+def decode_chunk_args(args):
+    return decode_chunk(*args)
+
+def chunks(path, fmt, samp_per_sym=20, segments=None):
+    """Arguments for decode_chunk covering the recording, or only the (start, stop) segments"""
+    data, samp_rate = load(path, fmt)
+    unit = samp_per_sym if fmt in ("wav", "iq") else 1
+    length = SYMBOLS_PER_CHUNK * unit
+    # the demodulator leaves out the last partial timing block
+    overlap = (FRAME_BITS + 2 * demod.TIMING_BLOCK) * unit
+    if segments is None:
+        segments = [(0, len(data))]
+    return [(path, fmt, samp_per_sym, start, min(start + length, stop), min(start + length + overlap, stop))
+            for first, stop in segments for start in range(first, stop, length)]
+
+def index(path, fmt, samp_per_sym=20):
+    """Energy index of a WAV or IQ recording, built and stored if needed"""
+    data, samp_rate = load(path, fmt)
+    idx = energy.load_index(path, samp_per_sym)
+    if idx is None:
+        idx = energy.build_index(data, samp_per_sym, iq=(fmt == "iq"))
+        energy.save_index(path, idx)
+    return idx
+
+def datatype(path, fmt):
+    # SigMF datatype and header length of a recording
+    if fmt == "wav":
+        offset, dtype, channels, frames, samp_rate = wav_header(path)
+        return "{}_le".format({"<i2" : "ri16", "<f4" : "rf32"}[dtype]), offset
+    return {"iq" : "cf32_le", "symbols" : "rf32_le", "bits" : "ru8"}[fmt], 0
+
+def annotate(path, fmt, frames):
+    """Write the frames decoded from a recording as SigMF annotations next to it"""
+    data, samp_rate = load(path, fmt)
+    dtype, header_bytes = datatype(path, fmt)
+    annotations.write(path, frames, dtype, samp_rate, header_bytes)
+
+def decode_recording(path, fmt=None, samp_per_sym=20, pool=None, skip_silence=False,
+                     annotated=False, failed=False):
+    """List of frames decoded from a recording, optionally using a process pool
+
+    With skip_silence, WAV and IQ recordings are only decoded where the energy
+    index shows a signal. With annotated, only the frames in the SigMF annotations
+    of the recording are decoded again. Frames that fail FEC decoding are only
+    returned if failed is True.
+    """
+    fmt = fmt or guess_format(path)
+    unit = samp_per_sym if fmt in ("wav", "iq") else 1
+    segments = None
+    if annotated:
+        # lead-in for the demodulator to acquire the symbol timing
+        segments = annotations.segments(path, 2 * demod.TIMING_BLOCK * unit, len(load(path, fmt)[0]))
+    elif skip_silence and fmt in ("wav", "iq"):
+        segments = energy.active_segments(index(path, fmt, samp_per_sym), len(load(path, fmt)[0]))
+    work = chunks(path, fmt, samp_per_sym, segments)
+    results = pool.map(decode_chunk_args, work) if pool else map(decode_chunk_args, work)
+    return [frame for frames in results for frame in frames if failed or frame["status"] == "ok"]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# 
+# Copyright 2016 <+YOU OR YOUR COMPANY+>.
+# 
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+# 
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+# 
+
+from gnuradio import gr, gr_unittest
+from gnuradio import blocks
+import pmt
+from gnuradio import gr, gr_unittest
+from gnuradio import blocks
+import numpy
+import pmt
+import random
+import time
+
+import fec
+from aausat4_fec import aausat4_fec, SYNCWORD
+
+def run_decoder(decoder, packets, meta=pmt.PMT_NIL):
+    # post the packets to decoder and return the PDUs it publishes
+    tb = gr.top_block()
+    debug = blocks.message_debug()
+    tb.msg_connect(decoder, "out", debug, "store")
+    for packet in packets:
+        packet = bytearray(packet)
+        decoder.to_basic_block()._post(pmt.intern("in"),
+                                       pmt.cons(meta, pmt.init_u8vector(len(packet), packet)))
+    tb.start()
+    time.sleep(0.5)
+    tb.stop()
+    tb.wait()
+    return [debug.get_message(i) for i in range(debug.num_messages())]
+
+def meta_value(msg, key):
+    return pmt.to_python(pmt.dict_ref(pmt.car(msg), pmt.intern(key), pmt.PMT_NIL))
+
+class qa_aausat4_fec (gr_unittest.TestCase):
+
+    def setUp (self):
+        # a long frame, after the byte that follows the syncword
+        self.data = bytes(bytearray(range(fec.CSP_OVERHEAD + 80))) + b"\x00" * fec.HMAC_LENGTH
+        self.packet = b"\x00" + fec.PacketHandler().encode(self.data)
+
+    def test_001_polarity (self):
+        inverted = bytes(bytearray(b ^ 0xff for b in bytearray(self.packet)))
+        self.assertEqual(run_decoder(aausat4_fec(False), [inverted]), [])
+
+        msgs = run_decoder(aausat4_fec(False, either_polarity=True), [self.packet, inverted])
+        self.assertEqual(len(msgs), 2)
+        self.assertEqual([meta_value(msg, "inverted") for msg in msgs], [False, True])
+        for msg in msgs:
+            self.assertEqual(meta_value(msg, "frame_type"), "long")
+            self.assertEqual(bytes(bytearray(pmt.u8vector_elements(pmt.cdr(msg)))), self.data[:-fec.HMAC_LENGTH])
+
+
+    def test_002_gate (self):
+        # noise is rejected by the gate before RS, for both frame types
+        noise = bytes(bytearray(random.Random(0).getrandbits(8) for i in range(len(self.packet))))
+        decoder = aausat4_fec(False, gate=True)
+        msgs = run_decoder(decoder, [noise, self.packet])
+        self.assertEqual(len(msgs), 1)
+        self.assertEqual((decoder.ec.gate_accepted, decoder.ec.gate_rejected), (1, 2))
+        self.assertEqual(aausat4_fec(False, gate=True, gate_sigmas=2).ec.gate_sigmas, 2)
+
+    def test_003_rx_time (self):
+        # frames replayed from a log keep their recorded receive time
+        start = time.time()
+        msg = run_decoder(aausat4_fec(False), [self.packet])[0]
+        self.assertTrue(start <= meta_value(msg, "rx_time") <= time.time())
+        self.assertTrue(0 <= meta_value(msg, "decode_latency") < 1)
+        meta = pmt.dict_add(pmt.make_dict(), pmt.intern("rx_time"), pmt.from_double(1467000000.5))
+        msg = run_decoder(aausat4_fec(False), [self.packet], meta)[0]
+        self.assertEqual(meta_value(msg, "rx_time"), 1467000000.5)
+
+    def test_004_sync_slip (self):
+        # the correlator fired offset bits early (positive) or late (negative)
+        bits = numpy.concatenate((SYNCWORD,
+                                  numpy.unpackbits(numpy.frombuffer(self.packet, dtype=numpy.uint8)),
+                                  numpy.zeros(8, dtype=numpy.uint8)))
+        start = len(SYNCWORD)
+        length = 8 * len(self.packet)
+        offsets = [-3, -2, -1, 0, 1, 2, 3]
+        packets = [numpy.packbits(bits[start - offset:start - offset + length]).tobytes() for offset in offsets]
+
+        self.assertEqual(len(run_decoder(aausat4_fec(False), packets)), 1)
+        msgs = run_decoder(aausat4_fec(False, sync_slip=3), packets)
+        self.assertEqual([meta_value(msg, "sync_offset") for msg in msgs], offsets)
+        for msg in msgs:
+            self.assertEqual(bytes(bytearray(pmt.u8vector_elements(pmt.cdr(msg)))), self.data[:-fec.HMAC_LENGTH])
+        # offsets beyond the window are not tried
+        self.assertEqual(run_decoder(aausat4_fec(False, sync_slip=2), packets[:1] + packets[-1:]), [])
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_aausat4_fec, "qa_aausat4_fec.xml")
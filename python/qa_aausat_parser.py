@@ -21,7 +21,13 @@
 
 from gnuradio import gr, gr_unittest
 from gnuradio import blocks
-from aausat_parser import aausat_parser
+import pmt
+import time
+
+import fec
+from aausat4_fec import aausat4_fec
+from aausat4_beacon_parser import aausat4_beacon_parser
+from qa_beacon import make_beacon
 
 class qa_aausat_parser (gr_unittest.TestCase):
 
@@ -32,9 +38,31 @@ class qa_aausat_parser (gr_unittest.TestCase):
         self.tb = None
 
     def test_001_t (self):
+        # a beacon in a long frame, after the byte that follows the syncword
+        data = b"\x00" * fec.CSP_OVERHEAD + make_beacon() + b"\x00" * fec.HMAC_LENGTH
+        packet = bytearray(b"\x00" + fec.PacketHandler().encode(data))
+
         # set up fg
-        self.tb.run ()
+        decoder = aausat4_fec(False)
+        parser = aausat4_beacon_parser(False)
+        debug = blocks.message_debug()
+        self.tb.msg_connect(decoder, "out", parser, "in")
+        self.tb.msg_connect(parser, "out", debug, "store")
+        decoder.to_basic_block()._post(pmt.intern("in"),
+                                       pmt.cons(pmt.PMT_NIL, pmt.init_u8vector(len(packet), packet)))
+        self.tb.start ()
+        time.sleep(0.5)
+        self.tb.stop ()
+        self.tb.wait ()
+
         # check data
+        self.assertEqual(debug.num_messages(), 1)
+        msg = debug.get_message(0)
+        self.assertEqual(pmt.symbol_to_string(pmt.dict_ref(pmt.car(msg), pmt.intern("frame_type"), pmt.PMT_NIL)), "long")
+        b = pmt.to_python(pmt.cdr(msg))
+        self.assertEqual(sorted(b.keys()), ["ADCS1", "AIS2", "COM", "EPS"])
+        self.assertEqual(b["EPS"]["battery_voltage"], 204 * 40)
+        self.assertEqual(b["COM"]["boot_count"], 310)
 
 
 if __name__ == '__main__':
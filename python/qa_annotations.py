@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import json
+import os
+import shutil
+import tempfile
+
+import annotations
+import offline
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "aausat-4.wav")
+
+class qa_annotations (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+        self.recording = os.path.join(self.directory, "aausat-4.wav")
+        shutil.copy(EXAMPLE, self.recording)
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+
+    def test_001_write_read (self):
+        frames = offline.decode_recording(self.recording, failed=True)
+        offline.annotate(self.recording, "wav", frames)
+        with open(os.path.join(self.directory, "aausat-4.sigmf-meta")) as f:
+            meta = json.load(f)
+        self.assertEqual(meta["global"]["core:datatype"], "ri16_le")
+        self.assertEqual(meta["global"]["core:sample_rate"], 48000)
+        self.assertEqual(meta["global"]["core:dataset"], "aausat-4.wav")
+        self.assertEqual(meta["captures"][0]["core:header_bytes"], 44)
+
+        ok = [a for a in annotations.read(self.recording) if a["aausat:status"] == "ok"]
+        self.assertEqual(len(ok), 1)
+        self.assertEqual(ok[0]["core:label"], "long")
+        # the frame lasts as many samples as its symbols, give or take the timing
+        # adjustments of the demodulator
+        self.assertTrue(abs(ok[0]["core:sample_count"] - offline.FRAME_BITS * 20) < 2 * 20)
+
+    def test_002_redecode (self):
+        frames = offline.decode_recording(self.recording, failed=True)
+        offline.annotate(self.recording, "wav", frames)
+        frames = [f for f in frames if f["status"] == "ok"]
+        segments = annotations.segments(self.recording, 100, 153600)
+        self.assertTrue(sum(stop - start for start, stop in segments) < 153600 / 2)
+        again = offline.decode_recording(self.recording, annotated=True)
+        self.assertEqual([f["data"] for f in again], [f["data"] for f in frames])
+        # the symbol timing is acquired again, so positions can move a little
+        self.assertTrue(abs(again[0]["position"] - frames[0]["position"]) < 20)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_annotations, "qa_annotations.xml")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import os
+import shutil
+import struct
+import tempfile
+
+import archive
+from qa_beacon import make_beacon
+
+def clock_beacon(valid, rt_clock):
+    data = make_beacon(valid)
+    i = data.index(struct.pack(">I", 1467000000))
+    return data[:i] + struct.pack(">I", rt_clock) + data[i + 4:]
+
+class qa_archive (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+
+    def test_001_append_read (self):
+        a = archive.Archive(self.directory)
+        a.append(make_beacon(0x27) + make_beacon(0x02), [10.0, 20.0])
+        a.append(make_beacon(0x3f), 30.0)
+
+        eps = a.read("EPS")
+        self.assertEqual(list(eps["rx_time"]), [10.0, 30.0])
+        self.assertEqual(list(eps["battery_voltage"]), [204 * 40] * 2)
+        self.assertEqual(list(eps["rt_clock"]), [1467000000] * 2)
+        com = a.read("COM", 15.0, 40.0)
+        self.assertEqual(list(com["rx_time"]), [20.0, 30.0])
+        # the beacon without EPS carries the last EPS clock
+        self.assertEqual(list(com["rt_clock"]), [1467000000] * 2)
+        self.assertEqual(list(com["boot_count"]), [310] * 2)
+        self.assertEqual(a.read("ADCS2")["gyro"].tolist(), [[1, -2, 3]])
+        self.assertEqual(len(a.read("AIS1", 0.0, 30.0)["rx_time"]), 0)
+        self.assertEqual(len(a.read("EPS", 1467000000, 1467000001, clock="rt_clock")["rx_time"]), 2)
+        self.assertEqual(list(a.read("EPS", fields=["battery_voltage"])), ["battery_voltage"])
+        self.assertRaises(Exception, a.append, make_beacon(), 25.0)
+        a.close()
+
+        # reopening keeps the records and the time order
+        a = archive.Archive(self.directory)
+        self.assertEqual(len(a.read("EPS")["rx_time"]), 2)
+        self.assertRaises(Exception, a.append, make_beacon(), 25.0)
+        a.append(make_beacon(), 40.0)
+        self.assertEqual(list(a.read("EPS", 30.0)["rx_time"]), [30.0, 40.0])
+        a.close()
+
+    def test_002_partial_record (self):
+        a = archive.Archive(self.directory)
+        a.append(make_beacon(0x27) + make_beacon(0x27), [10.0, 20.0])
+        a.close()
+        # an interrupted write leaves a partial value in one column and a
+        # complete row in another
+        with open(a.path("EPS", "rx_time"), "ab") as f:
+            f.write(b"\x01" * 13)
+        with open(a.path("EPS", "rt_clock"), "ab") as f:
+            f.write(b"\x01" * 4)
+
+        a = archive.Archive(self.directory)
+        self.assertEqual(os.path.getsize(a.path("EPS", "rx_time")), 2 * 8)
+        self.assertEqual(os.path.getsize(a.path("EPS", "rt_clock")), 2 * 4)
+        a.append(make_beacon(0x27), 30.0)
+        eps = a.read("EPS")
+        self.assertEqual(list(eps["rx_time"]), [10.0, 20.0, 30.0])
+        self.assertEqual(list(eps["battery_voltage"]), [204 * 40] * 3)
+        a.close()
+
+    def test_003_rt_clock_gaps (self):
+        # beacons without EPS keep the rt_clock column ordered
+        a = archive.Archive(self.directory)
+        a.append(make_beacon(0x02), 0.5)
+        a.append(clock_beacon(0x27, 100) + make_beacon(0x02) + clock_beacon(0x27, 300), [1.0, 2.0, 3.0])
+        a.close()
+        a = archive.Archive(self.directory)
+        a.append(make_beacon(0x02) + clock_beacon(0x27, 400), [4.0, 5.0])
+        self.assertEqual(list(a.read("COM")["rt_clock"]), [0, 100, 100, 300, 300, 400])
+        self.assertEqual(list(a.read("COM", 50, 150, clock="rt_clock")["rx_time"]), [1.0, 2.0])
+        self.assertEqual(list(a.read("COM", 300, 400, clock="rt_clock")["rx_time"]), [3.0, 4.0])
+        self.assertEqual(list(a.read("EPS", 50, 350, clock="rt_clock")["rx_time"]), [1.0, 3.0])
+        a.close()
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_archive, "qa_archive.xml")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import struct
+import numpy
+
+import beacon
+
+# valid bits for EPS, COM, ADCS1 and AIS2, as usually seen
+VALID = 0x27
+
+EPS = struct.pack(">HIIBHBbbBbbb", 312, 5000, 1467000000, 1, 0x1234, 204, -2, -35, 21, 12, 15, 3)
+COM = struct.pack(">HHHhBB", 0xe000 | 310, 45, 1200, -102, 7, 1)
+ADCS1 = struct.pack(">hhhB", -10, 20, -30, 2)
+ADCS2 = struct.pack(">hhh", 1, -2, 3)
+AIS = struct.pack(">HhhH12s", 17, 0, 0, 4, b"\x00" * 12)
+
+def make_beacon(valid=VALID):
+    return struct.pack(">B", valid) + EPS + COM + ADCS1 + ADCS2 + AIS + AIS
+
+class qa_beacon (gr_unittest.TestCase):
+
+    def test_001_parse (self):
+        b = beacon.Beacon(make_beacon())
+        self.assertEqual(sorted(b.subsystems.keys()), ["ADCS1", "AIS2", "COM", "EPS"])
+
+        eps = b.subsystems["EPS"]
+        self.assertEqual((eps.boot_count, eps.uptime, eps.rt_clock), (312, 5000, 1467000000))
+        self.assertEqual((eps.battery_voltage, eps.cell_diff, eps.battery_current, eps.solar_power),
+                         (204 * 40, -2 * 4, -35 * 10, 21 * 20))
+        self.assertEqual((eps.temp, eps.pa_temp), (12, 15))
+
+        com = b.subsystems["COM"]
+        self.assertEqual((com.boot_count, com.packets_received, com.packets_send), (310, 45, 1200))
+        self.assertEqual(com.latest_rssi, -102)
+
+        self.assertEqual(b.subsystems["ADCS1"].bdot, (-10, 20, -30))
+        self.assertEqual(b.subsystems["AIS2"].unique_mssi, 4)
+        self.assertRaises(ValueError, beacon.Beacon, make_beacon()[:-1])
+
+    def test_002_to_dict (self):
+        d = beacon.Beacon(make_beacon(0x3f)).to_dict()
+        self.assertEqual(sorted(d.keys()), ["ADCS1", "ADCS2", "AIS1", "AIS2", "COM", "EPS"])
+        self.assertEqual(d["EPS"]["battery_voltage"], 204 * 40)
+        self.assertEqual(d["COM"]["boot_count"], 310)
+        self.assertEqual(d["ADCS1"], {"bdot": (-10, 20, -30), "state": 2})
+        self.assertEqual(d["ADCS2"], {"gyro": (1, -2, 3)})
+        self.assertEqual(d["AIS1"], {"boot_count": 17, "unique_mssi": 4})
+        self.assertEqual(len(d["EPS"]), 12)
+        self.assertEqual(len(d["COM"]), 6)
+
+    def test_003_lazy (self):
+        b = beacon.Beacon(make_beacon())
+        self.assertEqual(b.decoded, {})
+        self.assertEqual(b.COM.packets_send, 1200)
+        self.assertEqual(list(b.decoded.keys()), ["COM"])
+        self.assertTrue(b.COM is b.COM)
+        self.assertTrue(b.ADCS2 is None)
+        self.assertRaises(AttributeError, getattr, b, "TTC")
+        self.assertRaises(AttributeError, setattr, b.EPS, "extra", 1)
+
+    def test_004_parse_many (self):
+        valids = [0x27, 0x3f, 0x00, 0x01]
+        raw = b"".join(make_beacon(v) for v in valids)
+        columns, masks = beacon.parse_many(raw)
+        self.assertEqual(list(masks["EPS"]), [True, True, False, True])
+        self.assertEqual(list(masks["ADCS2"]), [False, True, False, False])
+
+        # columns must match the scalar parser field by field
+        b = beacon.Beacon(make_beacon(0x3f))
+        for name, subsystem in b.subsystems.items():
+            for field, value in subsystem.to_dict().items():
+                column = columns[name][field]
+                self.assertEqual(len(column), len(valids))
+                self.assertEqual(tuple(numpy.atleast_1d(column[1]).tolist()), tuple(numpy.atleast_1d(value).tolist()))
+
+        columns, masks = beacon.parse_many(raw, 2)
+        self.assertEqual(len(masks["COM"]), 2)
+
+    def test_005_schema (self):
+        fields = (("counter", "H", 1, 0x0fff), (None, "2x"), ("voltage", "b", 10), ("vector", "2h"))
+        schema = beacon.Schema(16, (("A", beacon.Subsystem, 1, 1 << 0, fields),
+                                    ("B", beacon.Subsystem, 10, 1 << 1, fields[:1])))
+        raw = struct.pack(">BHhbhh", 0x01, 0xf123, 0, -5, 7, -8) + struct.pack(">H4x", 0x2345)
+        valid, values = schema.unpack(raw)
+        self.assertEqual(valid, 0x01)
+        self.assertEqual(values, {"A" : (0x123, -50, (7, -8)), "B" : (0x345,)})
+
+        columns, masks = schema.parse_many(raw * 3)
+        self.assertEqual(list(columns["A"]["voltage"]), [-50] * 3)
+        self.assertEqual(columns["A"]["vector"].tolist(), [[7, -8]] * 3)
+        self.assertEqual(list(columns["B"]["counter"]), [0x345] * 3)
+        self.assertEqual(list(masks["B"]), [False] * 3)
+        self.assertRaises(Exception, beacon.Schema, 8, (("A", beacon.Subsystem, 1, 1, fields),))
+
+    def test_006_repeated_scaled (self):
+        # scale and mask apply to every element of a repeated field, in both parsers
+        fields = (("v", "2h", 10), ("m", "2H", 1, 0x00ff))
+        schema = beacon.Schema(9, (("A", beacon.Subsystem, 1, 1 << 0, fields),))
+        raw = struct.pack(">BhhHH", 0x01, 3, -4, 0x1234, 0x5678)
+        valid, values = schema.unpack(raw)
+        self.assertEqual(values["A"], ((30, -40), (0x34, 0x78)))
+        columns, masks = schema.parse_many(raw * 2)
+        self.assertEqual(columns["A"]["v"].tolist(), [list(values["A"][0])] * 2)
+        self.assertEqual(columns["A"]["m"].tolist(), [list(values["A"][1])] * 2)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_beacon, "qa_beacon.xml")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import os
+
+import benchmark
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "aausat-4.wav")
+
+class qa_benchmark (gr_unittest.TestCase):
+
+    def test_001_run (self):
+        results = benchmark.run(EXAMPLE, repeat=1, scale=0.05)
+        for group in ("recording", "viterbi_long", "viterbi_short", "decode_rs", "packet_handler", "parser"):
+            self.assertTrue(group in results["results"])
+        self.assertEqual(len(results["results"]["decode_rs"]), len(benchmark.RS_ERRORS))
+        for group in results["results"].values():
+            for r in group.values():
+                self.assertTrue(r["value"] > 0 or r["unit"] == "us")
+
+        rows = benchmark.compare(results, results)
+        self.assertEqual(len(rows), sum(len(g) for g in results["results"].values()))
+        self.assertTrue(all(row[-1] == 1.0 for row in rows))
+
+        # without a recording, only its benchmark is left out
+        results = benchmark.run(repeat=1, scale=0.05)
+        self.assertFalse("recording" in results["results"])
+        self.assertTrue("parser" in results["results"])
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_benchmark, "qa_benchmark.xml")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import beacon
+import database
+from qa_beacon import make_beacon
+
+class qa_database (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "telemetry.db")
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+
+    def test_001_add_query (self):
+        db = database.Database(self.path, batch_size=1000, flush_interval=3600)
+        self.assertEqual(db.connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        db.add(beacon.Beacon(make_beacon(0x27)), 10.0)
+        db.add(beacon.Beacon(make_beacon(0x0a)), 20.0)
+        self.assertTrue(len(db.pending) > 0)
+
+        latest = db.latest("COM")
+        self.assertEqual(db.pending, [])
+        self.assertEqual(latest["boot_count"], 310)
+        self.assertEqual(latest["latest_rssi"], -102)
+        self.assertEqual(db.latest("ADCS2"), {"gyro.0" : 1, "gyro.1" : -2, "gyro.2" : 3})
+        self.assertEqual(db.series("COM", "packets_send"), [(10.0, 1200), (20.0, 1200)])
+        self.assertEqual(db.series("COM", "packets_send", 15.0), [(20.0, 1200)])
+        self.assertEqual(db.series("EPS", "battery_voltage", 0.0, 15.0), [(10.0, 204 * 40)])
+        db.close()
+
+        db = database.Database(self.path)
+        self.assertEqual(len(db.series("COM", "boot_count")), 2)
+        count = db.connection.execute("SELECT COUNT(*) FROM telemetry WHERE boot_count = 310").fetchone()[0]
+        self.assertEqual(count, 2 * len(beacon.COM.FIELDS))
+        db.close()
+
+    def test_002_batching (self):
+        db = database.Database(self.path, batch_size=15, flush_interval=3600)
+        db.add(beacon.Beacon(make_beacon(0x02)), 10.0)
+        self.assertEqual(len(db.pending), len(beacon.COM.FIELDS))
+        db.add(beacon.Beacon(make_beacon(0x01)), 20.0)
+        self.assertEqual(db.pending, [])
+        db.close()
+
+    def test_003_timer (self):
+        # pending rows are committed after flush_interval even if no more beacons arrive
+        db = database.Database(self.path, batch_size=1000, flush_interval=0.1)
+        db.add(beacon.Beacon(make_beacon(0x02)), 10.0)
+        self.assertTrue(db.timer is not None)
+        other = sqlite3.connect(self.path)
+        count = "SELECT COUNT(*) FROM telemetry"
+        self.assertEqual(other.execute(count).fetchone()[0], 0)
+        time.sleep(0.5)
+        self.assertEqual(db.pending, [])
+        self.assertEqual(db.timer, None)
+        self.assertEqual(other.execute(count).fetchone()[0], len(beacon.COM.FIELDS))
+        other.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_database, "qa_database.xml")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import numpy
+import os
+
+import demod
+import offline
+import sync
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "aausat-4.wav")
+SAMP_PER_SYM = 20
+
+def modulate(bits, samp_per_sym, rate=1.0, deviation=0.5, snr=None, seed=0):
+    # continuous phase FSK at complex baseband; rate scales the symbol clock
+    t = numpy.arange(int(len(bits) * samp_per_sym / rate))
+    symbols = 2.0 * bits[(t * rate / samp_per_sym).astype(int)] - 1
+    x = numpy.exp(1j * numpy.pi * deviation / samp_per_sym * numpy.cumsum(symbols))
+    if snr is not None:
+        r = numpy.random.RandomState(seed)
+        x += (r.randn(len(x)) + 1j * r.randn(len(x))) * 10**(-snr / 20.0) / numpy.sqrt(2)
+    return x.astype(numpy.complex64)
+
+class qa_demod (gr_unittest.TestCase):
+
+    def test_001_audio (self):
+        audio, samp_rate = offline.read_wav(EXAMPLE)
+        symbols, positions = demod.Demodulator(SAMP_PER_SYM).work(audio)
+        bits = (symbols > 0).astype(numpy.uint8)
+        offsets, distances = sync.find_syncwords(bits, threshold=0)
+        self.assertEqual(len(offsets), 1)
+
+        # processing in pieces gives the same symbols
+        d = demod.Demodulator(SAMP_PER_SYM)
+        pieces = [d.work(audio[i:i+1000]) for i in range(0, len(audio), 1000)]
+        self.assertTrue(numpy.array_equal(numpy.concatenate([p[0] for p in pieces]), symbols))
+        self.assertTrue(numpy.array_equal(numpy.concatenate([p[1] for p in pieces]), positions))
+
+    def test_002_iq_drift (self):
+        bits = numpy.random.RandomState(1).randint(0, 2, 5000).astype(numpy.uint8)
+        for rate in (0.998, 1.0, 1.002):
+            x = modulate(bits, SAMP_PER_SYM, rate, snr=10)
+            symbols, positions = demod.Demodulator(SAMP_PER_SYM, iq=True).work(x)
+            hard = (symbols > 0).astype(numpy.uint8)
+            # the symbol stream follows the transmitter clock, with no errors
+            # once aligned (a symbol may be lost before the timing is acquired)
+            n = len(hard) - demod.TIMING_BLOCK
+            errors = [numpy.count_nonzero(hard[s:n] != bits[:n-s]) for s in (0, 1)] + \
+                     [numpy.count_nonzero(hard[:n] != bits[1:n+1])]
+            self.assertEqual(min(errors), 0)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_demod, "qa_demod.xml")
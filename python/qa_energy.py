@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import numpy
+import os
+import shutil
+import tempfile
+
+import energy
+import offline
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "aausat-4.wav")
+
+class qa_energy (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+        self.recording = os.path.join(self.directory, "aausat-4.wav")
+        shutil.copy(EXAMPLE, self.recording)
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+
+    def test_001_segments (self):
+        frames = offline.decode_recording(self.recording)
+        index = offline.index(self.recording, "wav")
+        self.assertTrue(os.path.exists(energy.index_path(self.recording)))
+        samples = len(offline.read_wav(self.recording)[0])
+        segments = energy.active_segments(index, samples)
+
+        # the frame is active, and most of the recording is skipped
+        self.assertTrue(any(start <= frames[0]["position"] < stop for start, stop in segments))
+        self.assertTrue(sum(stop - start for start, stop in segments) < samples / 2)
+        found = offline.decode_recording(self.recording, skip_silence=True)
+        self.assertEqual([f["data"] for f in found], [f["data"] for f in frames])
+
+    def test_002_stored (self):
+        index = offline.index(self.recording, "wav")
+        stored = energy.load_index(self.recording, 20)
+        self.assertEqual(stored["window"], index["window"])
+        self.assertTrue(numpy.array_equal(stored["ratio"], index["ratio"]))
+        self.assertTrue(energy.load_index(self.recording, 10) is None)
+        # a recording newer than its index is indexed again
+        os.utime(energy.index_path(self.recording), (0, 0))
+        self.assertTrue(energy.load_index(self.recording, 20) is None)
+
+    def test_003_short (self):
+        index = energy.build_index(numpy.zeros(100, dtype=numpy.float32), 20)
+        self.assertEqual(energy.active_segments(index, 100), [(0, 100)])
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_energy, "qa_energy.xml")
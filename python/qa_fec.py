@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import ctypes
+import random
+
+import fec
+
+def flip_bits(frame, step):
+    data = bytearray(frame)
+    for n in range(0, len(data) * fec.BITS_PER_BYTE, step):
+        data[n // fec.BITS_PER_BYTE] ^= 0x80 >> (n % fec.BITS_PER_BYTE)
+    return bytes(data)
+
+def flip_bursts(frame, count, spacing, length):
+    data = bytearray(frame)
+    for k in range(count):
+        for n in range(k * spacing, k * spacing + length):
+            data[n // fec.BITS_PER_BYTE] ^= 0x80 >> (n % fec.BITS_PER_BYTE)
+    return bytes(data)
+
+class qa_fec (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.ec = fec.PacketHandler()
+        self.payload = bytes(bytearray(range(fec.CSP_OVERHEAD + 80)))
+
+    def tearDown (self):
+        self.ec = None
+
+    def test_001_roundtrip (self):
+        frame = self.ec.encode(self.payload)
+        self.assertEqual(self.ec.decode(frame)[0], self.payload)
+        self.assertEqual(self.ec.encode(self.ec.decode(fec.TESTDATA)[0]), fec.TESTDATA)
+
+    def test_002_list_decode (self):
+        ec = fec.PacketHandler(list_size=8)
+        self.assertEqual(ec.decode(fec.TESTDATA), self.ec.decode(fec.TESTDATA))
+        frame = flip_bits(self.ec.encode(self.payload), 29)
+        self.assertEqual(ec.decode(frame)[0], self.payload)
+        # list_viterbi lists at most VITERBI_LIST_MAX paths
+        self.assertEqual(fec.PacketHandler(list_size=fec.VITERBI_LIST_MAX).decode(frame)[0], self.payload)
+        for list_size in (0, fec.VITERBI_LIST_MAX + 1):
+            self.assertRaises(Exception, fec.PacketHandler, list_size=list_size)
+
+    def test_003_list_order (self):
+        rx = flip_bits(self.ec.encode(self.payload), 23)
+        rx_length = len(rx) // fec.VITERBI_RATE - fec.VITERBI_TAIL
+        nbits = rx_length * fec.BITS_PER_BYTE
+        nlist = 8
+
+        syms = ctypes.create_string_buffer(rx)
+        fec.bbfec.init_viterbi(self.ec.vp, 0)
+        fec.bbfec.update_viterbi_soft(self.ec.vp, syms, nbits + fec.VITERBI_CONSTRAINT - 1)
+        paths = ctypes.create_string_buffer(nlist * rx_length)
+        metrics = (ctypes.c_int * nlist)()
+        count = fec.bbfec.list_viterbi(self.ec.vp, paths, metrics, nbits, 0, nlist)
+        paths = [paths[i * rx_length:(i + 1) * rx_length] for i in range(count)]
+
+        self.assertEqual(count, nlist)
+        self.assertEqual(len(set(paths)), nlist)
+        self.assertEqual(list(metrics), sorted(metrics))
+
+        # path metrics are the Hamming distance to the received symbols
+        for path, metric in zip(paths, metrics):
+            code = ctypes.create_string_buffer(path, fec.MAX_FEC_LENGTH)
+            fec.bbfec.encode_viterbi(code, code, nbits)
+            distance = sum(bin(a ^ b).count("1") for a, b in zip(bytearray(code[:len(rx)]), bytearray(rx)))
+            self.assertEqual(distance, metric)
+
+    def test_004_erasures (self):
+        ec = fec.PacketHandler(erasures=True)
+        self.assertEqual(ec.decode(fec.TESTDATA), self.ec.decode(fec.TESTDATA))
+        # burst errors in 20 bytes are beyond what RS can correct on its own
+        frame = flip_bursts(self.ec.encode(self.payload), 20, 97, 8)
+        self.assertRaises(Exception, self.ec.decode, frame)
+        self.assertEqual(ec.decode(frame)[0], self.payload)
+
+        # noise must not decode, even with erasures
+        rng = random.Random(1)
+        for i in range(50):
+            noise = bytes(bytearray(rng.getrandbits(8) for j in range(250)))
+            self.assertRaises(Exception, ec.decode, noise)
+
+    def test_005_iterative (self):
+        ec = fec.PacketHandler(iterations=2)
+        self.assertEqual(ec.decode(fec.TESTDATA), self.ec.decode(fec.TESTDATA))
+        # a short payload leaves zero padding that the second pass can pin
+        payload = self.payload[:fec.CSP_OVERHEAD + 40]
+        frame = flip_bursts(self.ec.encode(payload), 20, 97, 8)
+        self.assertRaises(Exception, self.ec.decode, frame)
+        self.assertEqual(ec.decode(frame)[0], payload)
+
+    def test_005b_iterative_constraints (self):
+        # structure only: size MSB, the size bits above the largest size
+        # that fits (86 in a long frame) and nothing after
+        ec = fec.PacketHandler(iterations=4, randomize=False)
+        mask, bits = ec.frame_constraints(124)
+        self.assertEqual(bytearray(mask)[:3], bytearray([0xff, 0x80, 0x00]))
+        self.assertEqual(bits, b"\x00" * 124)
+
+        # a size from a failed pass is pinned once, then the next pass goes
+        # back to the structure alone instead of locking it in
+        passes = []
+        sizes = iter([40, 40, 70, 70, 40])
+        def decode_viterbi(data_mutable, rx_length, known=None):
+            passes.append(bytearray(known[0].raw)[1] if known else None)
+            data_mutable[1] = chr(next(sizes))
+            raise Exception("Reed-Solomon decoding error")
+        ec.decode_viterbi = decode_viterbi
+        self.assertRaises(Exception, ec.decode, self.ec.encode(self.payload))
+        self.assertEqual(passes, [None, 0xff, 0x80, 0xff, 0x80])
+        # a size that keeps coming back is not pinned again
+        passes = []
+        sizes = iter([40] * 5)
+        self.assertRaises(Exception, ec.decode, self.ec.encode(self.payload))
+        self.assertEqual(passes, [None, 0xff, 0x80])
+
+    def test_006_either_polarity (self):
+        ec = fec.PacketHandler(either_polarity=True)
+        inverted = bytes(bytearray(b ^ 0xff for b in bytearray(fec.TESTDATA)))
+        self.assertEqual(ec.decode(fec.TESTDATA), self.ec.decode(fec.TESTDATA))
+        self.assertFalse(ec.inverted)
+        self.assertEqual(ec.decode(inverted), self.ec.decode(fec.TESTDATA))
+        self.assertTrue(ec.inverted)
+        frame = flip_bits(self.ec.encode(self.payload), 29)
+        inverted = bytes(bytearray(b ^ 0xff for b in bytearray(frame)))
+        self.assertEqual(ec.decode(inverted)[0], self.payload)
+        self.assertTrue(ec.inverted)
+
+    def test_006b_either_polarity_iterative (self):
+        # the constrained passes must use the polarity of the best path
+        ec = fec.PacketHandler(either_polarity=True, iterations=2)
+        payload = self.payload[:fec.CSP_OVERHEAD + 40]
+        frame = flip_bursts(self.ec.encode(payload), 20, 97, 8)
+        inverted = bytes(bytearray(b ^ 0xff for b in bytearray(frame)))
+        self.assertEqual(ec.decode(frame)[0], payload)
+        self.assertFalse(ec.inverted)
+        self.assertEqual(ec.decode(inverted)[0], payload)
+        self.assertTrue(ec.inverted)
+
+    def test_007_gate (self):
+        ec = fec.PacketHandler(gate=True)
+        rng = random.Random(0)
+        for length in (250, 128):
+            noise = bytes(bytearray(rng.getrandbits(8) for i in range(length)))
+            self.assertRaises(Exception, ec.decode, noise)
+            self.assertTrue(ec.noise)
+        self.assertEqual(ec.decode(fec.TESTDATA), self.ec.decode(fec.TESTDATA))
+        self.assertFalse(ec.noise)
+        frame = flip_bits(self.ec.encode(self.payload), 29)
+        self.assertEqual(ec.decode(frame)[0], self.payload)
+        self.assertEqual((ec.gate_accepted, ec.gate_rejected), (2, 2))
+
+        # more sigmas keep more frames; the threshold is calibrated on the
+        # end states that decoding uses
+        strict = fec.PacketHandler(gate=True, gate_sigmas=2, gate_frames=16)
+        loose = fec.PacketHandler(gate=True, gate_sigmas=8, gate_frames=16)
+        self.assertTrue(strict.gate_threshold(123) > loose.gate_threshold(123))
+        self.assertEqual(list(strict.gate_thresholds), [(123, (0,))])
+        strict.inverted = True
+        strict.gate_threshold(123)
+        self.assertEqual(sorted(strict.gate_thresholds), [(123, (0,)), (123, (fec.INVERTED_STATE,))])
+
+    def test_008_stats (self):
+        ec = fec.PacketHandler(key="test", instrument=True)
+        frame = ec.frame(self.payload)
+        self.assertEqual(ec.deframe(flip_bits(frame, 29))[0], self.payload)
+        self.assertRaises(Exception, ec.deframe, flip_bits(frame, 5))
+        # RS passes, but the HMAC does not match with another key
+        self.assertRaises(Exception, ec.deframe, fec.PacketHandler(key="other").frame(self.payload))
+
+        stats = ec.stats()
+        self.assertEqual(stats["calls"], {"decode" : 3, "encode" : 1})
+        self.assertEqual(stats["counters"], {"decoded" : 2, "rs_failures" : 1, "viterbi_failures" : 0,
+                                             "hmac_failures" : 1, "gate_accepted" : 0, "gate_rejected" : 0})
+        self.assertEqual(sum(stats["bit_corrections"].values()), 2)
+        self.assertEqual(sum(stats["byte_corrections"].values()), 2)
+        for stage in fec.STAGES:
+            self.assertTrue(stats["times"][stage] > 0)
+        self.assertTrue(stats["times"]["decode"] > stats["times"]["viterbi"])
+
+        self.assertEqual(ec.stats(reset=True), stats)
+        self.assertEqual(ec.stats()["calls"], {"decode" : 0, "encode" : 0})
+
+        # frames lost by the iterative or list decoder are not RS failures
+        ec = fec.PacketHandler(iterations=2, instrument=True)
+        self.assertRaises(Exception, ec.decode, flip_bits(ec.encode(self.payload), 5))
+        counters = ec.stats()["counters"]
+        self.assertEqual((counters["rs_failures"], counters["viterbi_failures"]), (0, 1))
+        ec = fec.PacketHandler(key="test", list_size=4, instrument=True)
+        self.assertRaises(Exception, ec.decode, flip_bits(ec.encode(self.payload), 5))
+        self.assertRaises(Exception, ec.decode, fec.PacketHandler(key="other").frame(self.payload))
+        counters = ec.stats()["counters"]
+        self.assertEqual((counters["rs_failures"], counters["viterbi_failures"], counters["hmac_failures"]), (0, 1, 1))
+
+        # list decoding checks the HMAC once per frame
+        checked = []
+        verify = ec.hmac_verify
+        ec.hmac_verify = lambda data: checked.append(data) or verify(data)
+        self.assertEqual(ec.deframe(ec.frame(self.payload))[0], self.payload)
+        self.assertEqual(len(checked), 1)
+
+        # nothing is recorded without instrumentation
+        self.ec.decode(fec.TESTDATA)
+        self.assertEqual(self.ec.stats()["times"]["decode"], 0)
+        self.assertEqual(self.ec.stats()["counters"]["decoded"], 0)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_fec, "qa_fec.xml")
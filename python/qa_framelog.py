@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr, gr_unittest
+from gnuradio import blocks
+import os
+import pmt
+import shutil
+import tempfile
+import time
+
+import framelog
+from frame_log_source import frame_log_source
+
+class qa_framelog (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "frames.log")
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+
+    def write_log (self):
+        w = framelog.Writer(self.path, station=7)
+        for i in range(10):
+            w.write(bytearray([i] * (i + 1)), 100.0 + i, framelog.FRAME if i % 2 else framelog.RAW)
+        w.close()
+
+    def test_001_write_read (self):
+        self.write_log()
+        r = framelog.Reader(self.path)
+        self.assertEqual(len(r), 10)
+        records = list(r.records())
+        self.assertEqual([rec.rx_time for rec in records], [100.0 + i for i in range(10)])
+        self.assertEqual(records[3], framelog.Record(103.0, 7, framelog.FRAME, b"\x03" * 4))
+        self.assertEqual(records[4].kind, framelog.RAW)
+
+        # seeking by time
+        self.assertEqual(r.find(104.5), 5)
+        self.assertEqual([rec.data[0:1] for rec in r.records(104.5, 107.0)], [b"\x05", b"\x06"])
+        self.assertEqual(list(r.records(200.0)), [])
+
+    def test_002_recover (self):
+        self.write_log()
+        # lost index and a partial record at the end, as after a crash
+        os.remove(framelog.index_path(self.path))
+        with open(self.path, "ab") as f:
+            f.write(framelog.RECORD_HEADER.pack(110.0, 7, framelog.RAW, 100) + b"\x00" * 10)
+        r = framelog.Reader(self.path)
+        self.assertEqual(len(r), 10)
+
+        # appending drops the partial record and keeps the index consistent
+        w = framelog.Writer(self.path)
+        w.write(b"\xaa", 111.0)
+        w.close()
+        records = list(framelog.Reader(self.path).records(109.0))
+        self.assertEqual(records, [framelog.Record(109.0, 7, framelog.FRAME, b"\x09" * 10),
+                                   framelog.Record(111.0, 0, framelog.RAW, b"\xaa")])
+        self.assertEqual(len(framelog.read_index(self.path)[0]), 11)
+
+        with open(self.path, "wb") as f:
+            f.write(b"not a log")
+        self.assertRaises(Exception, framelog.Reader, self.path)
+
+    def test_003_truncated_log (self):
+        # the index reached the disk but the end of the log did not
+        self.write_log()
+        size = os.path.getsize(self.path)
+        # the last record cut in its data, and in its header
+        for cut in (5, 12):
+            with open(self.path, "r+b") as f:
+                f.truncate(size - cut)
+            r = framelog.Reader(self.path)
+            self.assertEqual(len(r), 9)
+            self.assertEqual(list(r.records())[-1].rx_time, 108.0)
+        # the last two records missing
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 10 - 2 * framelog.RECORD_HEADER.size - 9)
+        self.assertEqual(len(framelog.Reader(self.path)), 8)
+
+        w = framelog.Writer(self.path)
+        w.write(b"\xbb", 120.0)
+        w.close()
+        records = list(framelog.Reader(self.path).records(107.0))
+        self.assertEqual(records, [framelog.Record(107.0, 7, framelog.FRAME, b"\x07" * 8),
+                                   framelog.Record(120.0, 0, framelog.RAW, b"\xbb")])
+        self.assertEqual(len(framelog.read_index(self.path)[0]), 9)
+
+    def test_004_sync_timer (self):
+        w = framelog.Writer(self.path, sync_interval=0.1)
+        w.write(b"\x01", 100.0)
+        self.assertTrue(w.timer is not None)
+        # records are readable before they are synced
+        self.assertEqual(len(framelog.Reader(self.path)), 1)
+        time.sleep(0.5)
+        self.assertEqual(w.timer, None)
+        w.close()
+
+    def test_005_replay (self):
+        self.write_log()
+        tb = gr.top_block()
+        source = frame_log_source(self.path, speed=0, start=102.0)
+        debug = blocks.message_debug()
+        tb.msg_connect(source, "out", debug, "store")
+        tb.start()
+        # the source signals the end of the log
+        self.assertTrue(source.done.wait(5))
+        tb.wait()
+        self.assertEqual(debug.num_messages(), 8)
+        msg = debug.get_message(0)
+        self.assertEqual(pmt.to_python(pmt.dict_ref(pmt.car(msg), pmt.intern("rx_time"), pmt.PMT_NIL)), 102.0)
+        self.assertEqual(list(pmt.u8vector_elements(pmt.cdr(msg))), [2] * 3)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_framelog, "qa_framelog.xml")
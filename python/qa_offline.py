@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import numpy
+import os
+import shutil
+import tempfile
+
+import fec
+import offline
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "aausat-4.wav")
+
+class qa_offline (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp()
+        self.chunk = offline.SYMBOLS_PER_CHUNK
+
+    def tearDown (self):
+        shutil.rmtree(self.directory)
+        offline.SYMBOLS_PER_CHUNK = self.chunk
+
+    def test_001_wav (self):
+        frames = offline.decode_recording(EXAMPLE)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0]["frame_type"], "long")
+        self.assertTrue("EPS" in frames[0]["beacon"])
+
+        # frames across chunk boundaries are decoded once
+        offline.SYMBOLS_PER_CHUNK = 1000
+        self.assertEqual([f["data"] for f in offline.decode_recording(EXAMPLE)], [frames[0]["data"]])
+
+    def test_002_bits (self):
+        # a short frame, followed by random bits up to the packet length
+        packet = numpy.frombuffer(b"\x00" + fec.TESTDATA, dtype=numpy.uint8)
+        r = numpy.random.RandomState(0)
+        bits = numpy.concatenate((r.randint(0, 2, 3000), offline.SYNCWORD, numpy.unpackbits(packet),
+                                  r.randint(0, 2, fec.PACKET_BITS - 8 * len(packet) + 500))).astype(numpy.uint8)
+        bits[3000 + 100] ^= 1
+        path = os.path.join(self.directory, "bits")
+        bits.tofile(path)
+
+        offline.SYMBOLS_PER_CHUNK = 2500
+        frames = offline.decode_recording(path)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0]["position"], 3000)
+        self.assertEqual(frames[0]["bit_corrections"], 1)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_offline, "qa_offline.xml")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import numpy
+
+import series
+
+class qa_series (gr_unittest.TestCase):
+
+    def test_001_roundtrip (self):
+        r = numpy.random.RandomState(1)
+        for values in (numpy.arange(5000) * 30 + 1467000000,
+                       numpy.cumsum(r.randint(-3, 4, 5000)),
+                       r.randint(-2**62, 2**62, 500),
+                       [-2**63, 2**63 - 1, 0],
+                       [7], []):
+            data = series.encode(values, block_size=256)
+            self.assertEqual(series.decode(data).tolist(), list(values))
+
+    def test_002_size (self):
+        # a clock sampled every 30 seconds takes a byte per value
+        data = series.encode(numpy.arange(10000) * 30 + 1467000000, block_size=1000)
+        self.assertTrue(len(data) < 10000 + 10 * series.BLOCK_HEADER.size + series.SERIES_HEADER.size)
+
+    def test_003_skip (self):
+        values = numpy.arange(1000) * 10
+        data = series.encode(values, block_size=100)
+        blocks = series.select_blocks(data, 2500, 3100)
+        self.assertEqual(blocks, [2, 3])
+        self.assertEqual(series.decode(data, blocks).tolist(), list(values[200:400]))
+        self.assertEqual(series.select_blocks(data, 20000), [])
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_series, "qa_series.xml")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import numpy
+
+import simulation
+
+def counts(points):
+    # ber is nan when no frame decodes
+    return [dict((k, v) for k, v in p.items() if k != "ber") for p in points]
+
+class qa_simulation (gr_unittest.TestCase):
+
+    def test_001_channels (self):
+        rng = numpy.random.RandomState(0)
+        bits = rng.randint(0, 2, size=(64, 2000)).astype(numpy.uint8)
+        for channel in simulation.CHANNELS:
+            received = simulation.transmit(channel, bits, 3.0, 0.35, rng)
+            p = simulation.crossover(channel, 3.0, 0.35)
+            self.assertAlmostEqual(numpy.mean(received != bits), p, delta=0.01)
+
+    def test_002_simulate (self):
+        points = simulation.simulate([0.0, 8.0], "bsc", batch=16, max_frames=64, max_errors=10)
+        # early stopping after the first batch at 0 dB
+        self.assertEqual((points[0]["frames"], points[0]["fer"]), (16, 1.0))
+        self.assertEqual((points[1]["frames"], points[1]["fer"], points[1]["ber"]), (64, 0.0, 0.0))
+        self.assertTrue(points[0]["channel_ber"] > points[1]["channel_ber"])
+
+        # results do not depend on the number of processes
+        args = ([4.0, 5.0], "awgn")
+        kwargs = {"batch" : 8, "max_frames" : 48, "max_errors" : 4, "seed" : 1}
+        self.assertEqual(counts(simulation.simulate(*args, **kwargs)),
+                         counts(simulation.simulate(*args, jobs=3, **kwargs)))
+
+        # points after min_fer are skipped
+        self.assertEqual(len(simulation.simulate([8.0, 9.0], batch=8, max_frames=8, min_fer=0.5)), 1)
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_simulation, "qa_simulation.xml")
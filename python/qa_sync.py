@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+from gnuradio import gr_unittest
+import numpy
+
+import fec
+import sync
+
+SYNCWORD = numpy.array([int(b) for b in fec.SYNCWORD], dtype=numpy.uint8)
+
+def reference(bits, syncword, threshold):
+    # bit by bit correlation
+    corr = numpy.correlate(2.0 * bits - 1, 2.0 * syncword - 1, "valid")
+    distances = ((len(syncword) - corr) / 2).astype(int)
+    offsets = numpy.flatnonzero(distances <= threshold)
+    return list(offsets), list(distances[offsets])
+
+class qa_sync (gr_unittest.TestCase):
+
+    def setUp (self):
+        self.block_bytes = sync.BLOCK_BYTES
+
+    def tearDown (self):
+        sync.BLOCK_BYTES = self.block_bytes
+
+    def test_001_search (self):
+        r = numpy.random.RandomState(0)
+        bits = r.randint(0, 2, 20000).astype(numpy.uint8)
+        for offset in (0, 777, 5003, len(bits) - len(SYNCWORD)):
+            bits[offset:offset+len(SYNCWORD)] = SYNCWORD
+            bits[offset + 3] ^= 1
+        for threshold in (0, 1, 8, 48):
+            offsets, distances = sync.find_syncwords(bits, threshold=threshold)
+            self.assertEqual((list(offsets), list(distances)), reference(bits, SYNCWORD, threshold))
+
+        # short syncwords and blocks smaller than the buffer
+        sync.BLOCK_BYTES = 100
+        offsets, distances = sync.find_syncwords(bits, "1011", 0)
+        self.assertEqual(list(offsets), reference(bits, numpy.array([1, 0, 1, 1]), 0)[0])
+        offsets, distances = sync.find_access_code(numpy.packbits(bits), len(bits), threshold=1)
+        self.assertEqual(list(offsets), [0, 777, 5003, len(bits) - len(SYNCWORD)])
+
+    def test_002_extract (self):
+        bits = numpy.random.RandomState(1).randint(0, 2, 5000).astype(numpy.uint8)
+        packets = sync.extract_packets(bits, [10, 2000, 4000], 1000)
+        self.assertEqual(packets.shape, (2, 125))
+        self.assertEqual(list(packets[1]), list(numpy.packbits(bits[2048:3048])))
+
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_sync, "qa_sync.xml")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import struct
+
+import numpy
+
+## Compressed series
+# Integer telemetry series (boot counts, clocks, packet counters, temperatures...)
+# are mostly monotonic or slowly varying, so they are stored as the differences
+# between consecutive values, zig-zag mapped to unsigned integers and written as
+# varints (7 bits per byte, MSB set on all bytes but the last).
+#
+# The series is split in blocks of block_size values. Each block starts with a
+# header holding its number of values, first value, minimum, maximum and the
+# length of its varint data, so that blocks outside a range of interest can be
+# skipped without decoding them. Encoding and decoding are vectorized with numpy.
+
+SERIES_HEADER = struct.Struct("<II") # number of values, number of blocks
+BLOCK_HEADER = struct.Struct("<IqqqI") # count, first, min, max, varint bytes
+MAX_VARINT_BYTES = 10
+
+def zigzag(x):
+    x = x.astype(numpy.int64)
+    return ((x << 1) ^ (x >> 63)).view(numpy.uint64)
+
+def unzigzag(z):
+    return (z >> numpy.uint64(1)).view(numpy.int64) ^ -(z & numpy.uint64(1)).view(numpy.int64)
+
+def varint_encode(z):
+    z = z.astype(numpy.uint64)
+    # bytes needed for each value
+    nbytes = numpy.ones(len(z), dtype=numpy.int64)
+    for k in range(1, MAX_VARINT_BYTES):
+        nbytes += z >= numpy.uint64(1) << numpy.uint64(7 * k)
+    offsets = numpy.cumsum(nbytes) - nbytes
+    out = numpy.zeros(numpy.sum(nbytes), dtype=numpy.uint8)
+    for k in range(MAX_VARINT_BYTES):
+        sel = nbytes > k
+        if not numpy.any(sel):
+            break
+        b = (z[sel] >> numpy.uint64(7 * k)) & numpy.uint64(0x7f)
+        b |= numpy.where(nbytes[sel] > k + 1, 0x80, 0).astype(numpy.uint64)
+        out[offsets[sel] + k] = b
+    return out.tobytes()
+
+def varint_decode(data):
+    b = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(b) == 0:
+        return numpy.zeros(0, dtype=numpy.uint64)
+    last = b < 0x80
+    ends = numpy.flatnonzero(last)
+    starts = numpy.concatenate(([0], ends[:-1] + 1))
+    # position of each byte inside its varint
+    group = numpy.concatenate(([0], numpy.cumsum(last)[:-1]))
+    position = numpy.arange(len(b)) - starts[group]
+    parts = (b & 0x7f).astype(numpy.uint64) << (numpy.uint64(7) * position.astype(numpy.uint64))
+    return numpy.bitwise_or.reduceat(parts, starts)
+
+def encode(values, block_size=1024):
+    """Encode an integer series as a string of bytes"""
+    values = numpy.asarray(values, dtype=numpy.int64)
+    blocks = []
+    for i in range(0, len(values), block_size):
+        block = values[i:i+block_size]
+        data = varint_encode(zigzag(numpy.diff(block)))
+        blocks.append(BLOCK_HEADER.pack(len(block), block[0], block.min(), block.max(), len(data)))
+        blocks.append(data)
+    return SERIES_HEADER.pack(len(values), len(blocks) // 2) + b"".join(blocks)
+
+def block_index(data):
+    """List of (count, first, min, max, offset of varint data, varint bytes) per block"""
+    count, nblocks = SERIES_HEADER.unpack_from(data)
+    offset = SERIES_HEADER.size
+    index = []
+    for _ in range(nblocks):
+        n, first, lo, hi, nbytes = BLOCK_HEADER.unpack_from(data, offset)
+        offset += BLOCK_HEADER.size
+        index.append((n, first, lo, hi, offset, nbytes))
+        offset += nbytes
+    return index
+
+def select_blocks(data, lo=None, hi=None):
+    """Indices of the blocks which may contain values with lo <= value <= hi"""
+    return [i for i, (n, first, bmin, bmax, offset, nbytes) in enumerate(block_index(data))
+            if (lo is None or bmax >= lo) and (hi is None or bmin <= hi)]
+
+def decode(data, blocks=None):
+    """Decode a series into a numpy int64 array
+
+    If blocks is given, only those blocks (as returned by select_blocks) are decoded.
+    """
+    index = block_index(data)
+    if blocks is not None:
+        index = [index[i] for i in blocks]
+    out = []
+    for n, first, lo, hi, offset, nbytes in index:
+        deltas = unzigzag(varint_decode(data[offset:offset+nbytes]))
+        out.append(numpy.concatenate(([first], first + numpy.cumsum(deltas))))
+    return numpy.concatenate(out).astype(numpy.int64) if out else numpy.zeros(0, dtype=numpy.int64)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import math
+import multiprocessing
+
+import numpy
+
+import fec
+
+## Monte Carlo simulation
+# Random payloads are framed with PacketHandler.frame, sent through a channel and
+# decoded with a PacketHandler configured as the decoder under test. Channels are
+# applied with NumPy to a batch of frames at once. Eb/N0 is per payload bit, so
+# it includes the rate of the whole FEC chain.
+#
+# Channels give hard decisions, as the decoder takes:
+#   awgn - BPSK over AWGN
+#   bsc - binary symmetric channel with the bit error rate of BPSK over AWGN
+#   fsk - binary symmetric channel with the bit error rate of non-coherent FSK,
+#         as received by the example flowgraphs
+#
+# Each batch has its own random generator, seeded from the seed, the Eb/N0 point
+# and the batch number. Batches are spread over processes in rounds, and results
+# are added up in batch order until the point has max_errors frame errors or
+# max_frames frames, so the results do not depend on the number of processes.
+
+CHANNELS = ("awgn", "bsc", "fsk")
+
+# payload bytes in a beacon frame: CSP header and beacon
+DEFAULT_LENGTH = 88
+BATCH_FRAMES = 64
+MAX_FRAMES = 1000000
+MAX_ERRORS = 100
+
+def crossover(channel, ebn0_db, rate):
+    """Bit error rate of the channel before decoding"""
+    esn0 = rate * 10 ** (ebn0_db / 10.0)
+    if channel == "fsk":
+        return 0.5 * math.exp(-esn0 / 2)
+    return 0.5 * math.erfc(math.sqrt(esn0))
+
+def transmit(channel, bits, ebn0_db, rate, rng):
+    # hard decisions for a batch of frames, one frame of unpacked bits per row
+    if channel == "awgn":
+        sigma = math.sqrt(1 / (2 * rate * 10 ** (ebn0_db / 10.0)))
+        noise = rng.standard_normal(bits.shape).astype(numpy.float32) * sigma
+        return ((1 - 2 * bits.astype(numpy.float32) + noise) < 0).astype(numpy.uint8)
+    flips = rng.random_sample(bits.shape) < crossover(channel, ebn0_db, rate)
+    return bits ^ flips.astype(numpy.uint8)
+
+# decoders in this process, by options
+handlers = {}
+
+def handler(options):
+    key = tuple(sorted(options.items()))
+    if key not in handlers:
+        handlers[key] = fec.PacketHandler(**options)
+    return handlers[key]
+
+def simulate_batch(args):
+    """Counts for one batch: (frames, failures, undetected, bit errors, channel bit errors, channel bits)"""
+    channel, ebn0_db, length, options, seed, point, batch, frames = args
+    rng = numpy.random.RandomState([seed, point, batch])
+    ec = handler(options)
+
+    payloads = rng.randint(0, 256, size=(frames, length)).astype(numpy.uint8)
+    encoded = numpy.array([bytearray(ec.frame(p.tobytes())) for p in payloads], dtype=numpy.uint8)
+    bits = numpy.unpackbits(encoded, axis=1)
+    rate = float(length * fec.BITS_PER_BYTE) / bits.shape[1]
+    received = transmit(channel, bits, ebn0_db, rate, rng)
+    channel_errors = numpy.count_nonzero(received != bits)
+    received = numpy.packbits(received, axis=1)
+
+    failures = undetected = bit_errors = 0
+    for payload, frame in zip(payloads, received):
+        try:
+            data = ec.deframe(frame.tobytes())[0]
+        except Exception:
+            failures += 1
+            continue
+        data = numpy.frombuffer(data, dtype=numpy.uint8)
+        if len(data) != length:
+            undetected += 1
+            bit_errors += length * fec.BITS_PER_BYTE
+            continue
+        errors = numpy.count_nonzero(numpy.unpackbits(data ^ payload))
+        undetected += errors != 0
+        bit_errors += errors
+    return frames, failures, undetected, bit_errors, channel_errors, bits.size
+
+def rates(point):
+    # frame and bit error rates of a point, from its counts
+    delivered = point["frames"] - point["failures"]
+    point["fer"] = float(point["failures"] + point["undetected"]) / point["frames"]
+    point["ber"] = float(point["bit_errors"]) / (delivered * point["length"] * fec.BITS_PER_BYTE) if delivered else float("nan")
+    point["channel_ber"] = float(point["channel_bit_errors"]) / point["channel_bits"]
+    return point
+
+def simulate(ebn0_db, channel="bsc", length=DEFAULT_LENGTH, options=None, seed=0, batch=BATCH_FRAMES,
+             max_frames=MAX_FRAMES, max_errors=MAX_ERRORS, min_fer=0, jobs=1):
+    """Simulate the frame error rate at each Eb/N0 in ebn0_db (in dB)
+
+    options are keyword arguments for the PacketHandler used to frame and decode.
+    Frame errors are frames that fail decoding or decode to the wrong payload
+    (undetected); ber is the bit error rate of the frames that decode. Points after
+    the first one with a frame error rate below min_fer are not simulated.
+    Returns a list of dictionaries with the counts and rates of each point.
+    """
+    options = options or {}
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    results = []
+    try:
+        for index, ebn0 in enumerate(ebn0_db):
+            point = {"ebn0_db" : ebn0, "channel" : channel, "length" : length, "frames" : 0,
+                     "failures" : 0, "undetected" : 0, "bit_errors" : 0,
+                     "channel_bit_errors" : 0, "channel_bits" : 0}
+            batches = 0
+            while point["frames"] < max_frames and point["failures"] + point["undetected"] < max_errors:
+                work = [(channel, ebn0, length, options, seed, index, batches + i,
+                         min(batch, max_frames - point["frames"] - i * batch)) for i in range(jobs)]
+                work = [w for w in work if w[-1] > 0]
+                counts = pool.map(simulate_batch, work) if pool else map(simulate_batch, work)
+                for count in counts:
+                    if point["frames"] >= max_frames or point["failures"] + point["undetected"] >= max_errors:
+                        break
+                    for name, value in zip(("frames", "failures", "undetected", "bit_errors",
+                                            "channel_bit_errors", "channel_bits"), count):
+                        point[name] += value
+                batches += len(work)
+            results.append(rates(point))
+            if point["fer"] < min_fer:
+                break
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return results
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+# 
+# Copyright (c) 2016 Daniel Estévez
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# 
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+import fec
+
+## Access code search
+# Bit-parallel search of a syncword (up to 48 bits) in packed bits. For every byte
+# offset, the 64 bits starting there are assembled into a word, and the syncword
+# is compared at the 8 bit offsets inside the byte with an XOR and a popcount
+# (three lookups in a 16 bit table).
+# The whole buffer is processed in a few numpy passes per block, instead of
+# correlating one bit at a time.
+
+BLOCK_BYTES = 1 << 20
+WORD_BYTES = 8
+MAX_SYNCWORD_BITS = 48
+
+# number of set bits in every 16 bit value
+POPCOUNT16 = numpy.array([bin(i).count("1") for i in range(1 << 16)], dtype=numpy.uint8)
+MASK16 = numpy.uint64(0xffff)
+
+def popcount48(x):
+    return (POPCOUNT16[x & MASK16] + POPCOUNT16[(x >> numpy.uint64(16)) & MASK16] +
+            POPCOUNT16[(x >> numpy.uint64(32)) & MASK16])
+
+def words(packed):
+    # 64 bit big-endian word starting at each byte, padded with zeros at the end
+    padded = numpy.concatenate((packed, numpy.zeros(WORD_BYTES - 1, dtype=numpy.uint8)))
+    windows = as_strided(padded, shape=(len(packed), WORD_BYTES), strides=(1, 1))
+    return windows.copy().view(">u8").ravel().astype(numpy.uint64)
+
+def find_access_code(packed, nbits=None, syncword=fec.SYNCWORD, threshold=8):
+    """Search syncword in packed bits (MSB first)
+
+    nbits is the number of valid bits in packed (all of them by default) and
+    syncword a string of 0 and 1. Returns the bit offsets where the syncword
+    starts with at most threshold bit errors, and the number of errors.
+    """
+    packed = numpy.frombuffer(packed, dtype=numpy.uint8) if not isinstance(packed, numpy.ndarray) else packed
+    length = len(syncword)
+    if length > MAX_SYNCWORD_BITS:
+        raise Exception("Syncwords longer than {} bits are not supported".format(MAX_SYNCWORD_BITS))
+    nbits = 8 * len(packed) if nbits is None else nbits
+    shift = numpy.uint64(64 - length)
+    pattern = numpy.uint64(int(syncword, 2))
+
+    offsets = [numpy.zeros(0, dtype=numpy.int64)]
+    distances = [numpy.zeros(0, dtype=numpy.int64)]
+    for start in range(0, len(packed), BLOCK_BYTES):
+        # each block also reads the bytes of syncwords starting at its end
+        w = words(packed[start:start+BLOCK_BYTES+WORD_BYTES])[:BLOCK_BYTES]
+        for s in range(8):
+            d = popcount48(((w << numpy.uint64(s)) >> shift) ^ pattern)
+            found = numpy.flatnonzero(d <= threshold)
+            offsets.append(8 * (start + found) + s)
+            distances.append(d[found])
+
+    offsets = numpy.concatenate(offsets).astype(numpy.int64)
+    distances = numpy.concatenate(distances).astype(numpy.int64)
+    order = numpy.argsort(offsets, kind="mergesort")
+    offsets, distances = offsets[order], distances[order]
+    keep = offsets + length <= nbits
+    return offsets[keep], distances[keep]
+
+def find_syncwords(bits, syncword=fec.SYNCWORD, threshold=8):
+    """As find_access_code, for unpacked bits (one bit per byte)"""
+    bits = numpy.asarray(bits, dtype=numpy.uint8)
+    return find_access_code(numpy.packbits(bits & 1), len(bits), syncword, threshold)
+
+def extract_packets(bits, offsets, nbits=fec.PACKET_BITS, syncword=fec.SYNCWORD):
+    """Packed packets of nbits following the syncwords at offsets in unpacked bits
+
+    Returns an array with a row per packet; packets which do not fit in bits are
+    dropped, so rows correspond to the first offsets.
+    """
+    offsets = numpy.asarray(offsets, dtype=numpy.int64) + len(syncword)
+    offsets = offsets[offsets + nbits <= len(bits)]
+    return numpy.packbits(bits[offsets[:,None] + numpy.arange(nbits)], axis=1)